@@ -8,20 +8,27 @@ import time
 from datetime import datetime
 from typing import Optional
 from contextlib import asynccontextmanager
+from functools import lru_cache
+from io import BytesIO
 
 import httpx
 import asyncio
+import os
+import certifi
+import urllib3
 import traceback
 from fastapi import FastAPI, HTTPException, BackgroundTasks, UploadFile, File, Form, Request, Response
 from fastapi.exceptions import RequestValidationError
-from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi.responses import JSONResponse, ORJSONResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-import json
+from starlette.datastructures import State
+import orjson
 from pydantic import BaseModel, Field
 from minio import Minio
 
 from config import get_settings
-from services import PDFExtractor, Summarizer
+from services import PDFExtractor, Summarizer, TTLCache, content_hash, read_object
+from services.summarizer import VALID_LANGUAGES, VALID_STYLES
 
 # Configure logging
 logging.basicConfig(
@@ -83,31 +90,92 @@ class GuestSummaryResponse(BaseModel):
     model_used: str = "gemini-2.0-flash-exp"
 
 
-# Initialize services
 settings = get_settings()
-pdf_extractor = PDFExtractor()
-summarizer = Summarizer()
-
-# Initialize MinIO client
-minio_client = None
-try:
-    minio_client = Minio(
-        settings.minio_endpoint,
-        access_key=settings.minio_access_key,
-        secret_key=settings.minio_secret_key,
-        secure=settings.minio_use_ssl
-    )
-    logger.info(f"MinIO client initialized: {settings.minio_endpoint}")
-except Exception as e:
-    logger.error(f"Failed to initialize MinIO client: {e}")
+
+# Guest uploads (10MB limit), read in 64 KiB chunks
+MAX_GUEST_UPLOAD_BYTES = 10 * 1024 * 1024
+UPLOAD_CHUNK_SIZE = 1 << 16
+# Characters of extracted text kept in the text cache (all entries together)
+TEXT_CACHE_MAX_CHARS = 64 * 1024 * 1024
+
+
+@lru_cache(maxsize=1)
+def get_minio_client() -> Optional[Minio]:
+    """Get cached MinIO client (None if it could not be initialized)"""
+    try:
+        # Same defaults as the MinIO SDK's own pool, with room for concurrent downloads
+        http_client = urllib3.PoolManager(
+            timeout=urllib3.Timeout(connect=300, read=300),
+            maxsize=16,
+            block=False,
+            cert_reqs="CERT_REQUIRED",
+            ca_certs=os.environ.get("SSL_CERT_FILE") or certifi.where(),
+            retries=urllib3.Retry(total=5, backoff_factor=0.2, status_forcelist=[500, 502, 503, 504])
+        )
+        client = Minio(
+            settings.minio_endpoint,
+            access_key=settings.minio_access_key,
+            secret_key=settings.minio_secret_key,
+            secure=settings.minio_use_ssl,
+            http_client=http_client
+        )
+        logger.info("MinIO client initialized: %s", settings.minio_endpoint)
+        return client
+    except Exception as e:
+        logger.error("Failed to initialize MinIO client: %s", e)
+        return None
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    """Application lifespan events"""
+    """Application lifespan events: build shared service singletons once"""
     logger.info("AI Service starting up...")
+    app.state.pdf_extractor = PDFExtractor()
+    app.state.summarizer = Summarizer()
+    app.state.minio = get_minio_client()
+    if app.state.minio:
+        # Pre-warm the connection pool so the first download reuses a live connection
+        try:
+            await asyncio.to_thread(app.state.minio.bucket_exists, settings.minio_bucket_files)
+        except Exception as e:
+            logger.warning("MinIO warm-up failed: %s", e)
+    # Content-addressed text cache: PDF hash -> text. Summaries are cached by the
+    # summarizer itself (keyed by text and options)
+    app.state.text_cache = TTLCache(maxsize=512, ttl=3600, max_total_len=TEXT_CACHE_MAX_CHARS)
+    # Bounds concurrent background summaries (MinIO download + Gemini calls)
+    app.state.summary_semaphore = asyncio.Semaphore(settings.max_concurrent_summaries)
+    # Shared keep-alive pool for backend callbacks
+    app.state.http = httpx.AsyncClient(
+        timeout=30.0,
+        limits=httpx.Limits(max_keepalive_connections=20)
+    )
     yield
     logger.info("AI Service shutting down...")
+    await app.state.http.aclose()
+
+
+async def read_upload(file: UploadFile, max_bytes: int = MAX_GUEST_UPLOAD_BYTES) -> bytes:
+    """Read an upload in chunks, rejecting it as soon as it exceeds max_bytes"""
+    buffer = BytesIO()
+    size = 0
+    while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+        size += len(chunk)
+        if size > max_bytes:
+            raise HTTPException(status_code=400, detail="File size exceeds 10MB limit")
+        buffer.write(chunk)
+    return buffer.getvalue()
+
+
+def extract_text_cached(state: State, pdf_bytes: bytes) -> str:
+    """Extract PDF text, reusing the cached result for identical files"""
+    pdf_hash = content_hash(pdf_bytes)
+    text = state.text_cache.get(pdf_hash)
+    if text is None:
+        text = state.pdf_extractor.extract_text(pdf_bytes)
+        state.text_cache.set(pdf_hash, text)
+    else:
+        logger.info("Text cache hit for %s", pdf_hash)
+    return text
 
 
 # Create FastAPI app
@@ -115,7 +183,8 @@ app = FastAPI(
     title="NEXT PDF AI Service",
     description="PDF summarization service using Google Gemini",
     version="1.0.0",
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
 )
 
 # Request Logging Middleware
@@ -124,23 +193,23 @@ async def log_requests(request: Request, call_next):
     client_host = request.client.host if request.client else "unknown"
     start_time = time.time()
     
-    logger.info(f"Request: {request.method} {request.url.path} | Client: {client_host}")
+    logger.info("Request: %s %s | Client: %s", request.method, request.url.path, client_host)
     
     try:
         response = await call_next(request)
         process_time = (time.time() - start_time) * 1000
-        logger.info(f"Response: {response.status_code} | Duration: {process_time:.2f}ms")
+        logger.info("Response: %s | Duration: %.2fms", response.status_code, process_time)
         return response
     except Exception as e:
         process_time = (time.time() - start_time) * 1000
-        logger.error(f"Request failed: {str(e)} | Duration: {process_time:.2f}ms")
+        logger.error("Request failed: %s | Duration: %.2fms", e, process_time)
         logger.error(traceback.format_exc())
         raise
 
 # Exception Handlers
 @app.exception_handler(RequestValidationError)
 async def validation_exception_handler(request: Request, exc: RequestValidationError):
-    logger.error(f"Validation Error: {exc.errors()} | Body: {exc.body}")
+    logger.error("Validation Error: %s | Body: %s", exc.errors(), exc.body)
     return JSONResponse(
         status_code=422,
         content={"detail": exc.errors(), "body": str(exc.body)},
@@ -148,7 +217,7 @@ async def validation_exception_handler(request: Request, exc: RequestValidationE
 
 @app.exception_handler(Exception)
 async def global_exception_handler(request: Request, exc: Exception):
-    logger.error(f"Global Exception: {str(exc)}")
+    logger.error("Global Exception: %s", exc)
     logger.error(traceback.format_exc())
     return JSONResponse(
         status_code=500,
@@ -182,6 +251,7 @@ async def get_styles():
 
 @app.post("/summarize-sync", response_model=GuestSummaryResponse)
 async def summarize_sync(
+    request: Request,
     file: UploadFile = File(..., description="PDF file to summarize"),
     style: str = Form(default="bullet_points", description="Summary style"),
     language: str = Form(default="en", description="Summary language: 'en' or 'id'"),
@@ -194,6 +264,7 @@ async def summarize_sync(
     and returns the summary in the response. No storage involved.
     """
     start_time = time.time()
+    summarizer = request.app.state.summarizer
     
     # Validate file type
     if not file.filename or not file.filename.lower().endswith('.pdf'):
@@ -203,40 +274,38 @@ async def summarize_sync(
         raise HTTPException(status_code=400, detail="Invalid file type. Must be PDF")
     
     # Validate style
-    valid_styles = ["bullet_points", "paragraph", "detailed", "executive", "academic"]
-    if style not in valid_styles:
+    if style not in VALID_STYLES:
         raise HTTPException(
             status_code=400,
-            detail=f"Invalid style. Must be one of: {', '.join(valid_styles)}"
+            detail=f"Invalid style. Must be one of: {', '.join(sorted(VALID_STYLES))}"
         )
     
     # Validate language
-    if language not in ["en", "id"]:
+    if language not in VALID_LANGUAGES:
         raise HTTPException(status_code=400, detail="Language must be 'en' or 'id'")
     
     try:
-        # Read PDF bytes directly from upload
-        pdf_bytes = await file.read()
-        
-        # Check file size (10MB limit for guests)
-        if len(pdf_bytes) > 10 * 1024 * 1024:
-            raise HTTPException(status_code=400, detail="File size exceeds 10MB limit")
+        # Read PDF bytes directly from upload (fails fast past the 10MB guest limit)
+        pdf_bytes = await read_upload(file)
             
         # Strict Validation
         if not await summarizer.validate_pdf(pdf_bytes):
             raise HTTPException(status_code=400, detail="Invalid PDF file. Header check failed.")
         
-        logger.info(f"Guest summarization: {len(pdf_bytes)} bytes, style={style}, lang={language}")
+        logger.info("Guest summarization: %d bytes, style=%s, lang=%s", len(pdf_bytes), style, language)
         
-        # Extract text from PDF
-        text = pdf_extractor.extract_text(pdf_bytes)
+        # Extract text from PDF (ValueError: unreadable or scanned / image-only PDF)
+        try:
+            text = await asyncio.to_thread(extract_text_cached, request.app.state, pdf_bytes)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
         if not text.strip():
             raise HTTPException(status_code=400, detail="No text could be extracted from the PDF")
         
-        logger.info(f"Extracted text: {len(text)} characters")
+        logger.info("Extracted text: %d characters", len(text))
         
         # Generate summary
-        title, content, prompt_tokens, completion_tokens = summarizer.generate_summary(
+        title, content, prompt_tokens, completion_tokens = await summarizer.generate_summary_async(
             text=text,
             style=style,
             custom_instructions=custom_instructions,
@@ -244,7 +313,7 @@ async def summarize_sync(
         )
         
         processing_time_ms = int((time.time() - start_time) * 1000)
-        logger.info(f"Guest summary generated in {processing_time_ms}ms")
+        logger.info("Guest summary generated in %sms", processing_time_ms)
         
         return GuestSummaryResponse(
             title=title,
@@ -257,12 +326,24 @@ async def summarize_sync(
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Guest summarization failed: {e}")
+        logger.error("Guest summarization failed: %s", e)
         raise HTTPException(status_code=500, detail=f"Failed to generate summary: {str(e)}")
 
 
+def sse_event(event: dict) -> bytes:
+    """Encode an event as a Server-Sent Events `data:` frame"""
+    return b"data: " + orjson.dumps(event) + b"\n\n"
+
+
+# Frames for fixed progress messages, encoded once
+SSE_VALIDATING = sse_event({"log": "Validating PDF structure..."})
+SSE_EXTRACTING = sse_event({"log": "Extracting text from PDF..."})
+SSE_NO_TEXT = sse_event({"error": "No text could be extracted from this PDF."})
+
+
 @app.post("/summarize-stream")
 async def summarize_stream(
+    request: Request,
     file: UploadFile = File(..., description="PDF file to summarize"),
     style: str = Form(default="bullet_points", description="Summary style"),
     language: str = Form(default="en", description="Summary language: 'en' or 'id'"),
@@ -271,37 +352,37 @@ async def summarize_stream(
     """
     Streamed PDF summarization for guest users (SSE).
     """
-    # 1. Read file
+    summarizer = request.app.state.summarizer
+
+    # 1. Read file (Size Validation: 10MB, checked while reading)
     try:
-        pdf_bytes = await file.read()
+        pdf_bytes = await read_upload(file)
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Failed to read upload: {e}")
+        logger.error("Failed to read upload: %s", e)
         raise HTTPException(status_code=400, detail="Failed to read file")
 
     # 2. Strict Validation
     if not await summarizer.validate_pdf(pdf_bytes):
         raise HTTPException(status_code=400, detail="Invalid PDF file. Header check failed.")
-    
-    # 3. Size Validation (10MB)
-    if len(pdf_bytes) > 10 * 1024 * 1024:
-        raise HTTPException(status_code=400, detail="File size exceeds 10MB limit")
 
     # Generator for SSE
     async def event_generator():
         try:
             # 4. Extract Text
-            yield f"data: {json.dumps({'log': 'Validating PDF structure...'})}\n\n"
+            yield SSE_VALIDATING
             await asyncio.sleep(0.1) # UI visual
 
-            yield f"data: {json.dumps({'log': 'Extracting text from PDF...'})}\n\n"
+            yield SSE_EXTRACTING
             try:
-                text = pdf_extractor.extract_text(pdf_bytes)
+                text = await asyncio.to_thread(extract_text_cached, request.app.state, pdf_bytes)
                 if not text.strip():
-                     yield f"data: {json.dumps({'error': 'No text could be extracted from this PDF.'})}\n\n"
+                     yield SSE_NO_TEXT
                      return
             except Exception as e:
-                 logger.error(f"Extraction failed: {e}")
-                 yield f"data: {json.dumps({'error': f'Text extraction failed: {str(e)}'})}\n\n"
+                 logger.error("Extraction failed: %s", e)
+                 yield sse_event({"error": f"Text extraction failed: {str(e)}"})
                  return
 
             # 5. Run Recursive Summarization
@@ -312,17 +393,17 @@ async def summarize_stream(
                 language=language
             ):
                 # event is a dict like {'log': 'MSG'} or {'result': {...}} or {'error': 'MSG'}
-                yield f"data: {json.dumps(event)}\n\n"
+                yield sse_event(event)
                 
         except Exception as e:
-            logger.error(f"Stream handler error: {e}")
-            yield f"data: {json.dumps({'error': f'Internal server error: {str(e)}'})}\n\n"
+            logger.error("Stream handler error: %s", e)
+            yield sse_event({"error": f"Internal server error: {str(e)}"})
 
     return StreamingResponse(event_generator(), media_type="text/event-stream")
 
 
 @app.post("/summarize", response_model=SummarizeResponse)
-async def summarize(request: SummarizeRequest, background_tasks: BackgroundTasks):
+async def summarize(request: SummarizeRequest, background_tasks: BackgroundTasks, http_request: Request):
     """
     Queue a PDF for summarization
     
@@ -330,16 +411,16 @@ async def summarize(request: SummarizeRequest, background_tasks: BackgroundTasks
     Results are sent to the callback URL when complete.
     """
     # Validate style
-    valid_styles = ["bullet_points", "paragraph", "detailed", "executive", "academic"]
-    if request.style not in valid_styles:
+    if request.style not in VALID_STYLES:
         raise HTTPException(
             status_code=400,
-            detail=f"Invalid style. Must be one of: {', '.join(valid_styles)}"
+            detail=f"Invalid style. Must be one of: {', '.join(sorted(VALID_STYLES))}"
         )
     
     # Add to background processing
     background_tasks.add_task(
         process_summary,
+        http_request.app.state,
         request.file_id,
         request.storage_path,
         request.style,
@@ -356,6 +437,7 @@ async def summarize(request: SummarizeRequest, background_tasks: BackgroundTasks
 
 
 async def process_summary(
+    state: State,
     file_id: str,
     storage_path: str,
     style: str,
@@ -363,39 +445,54 @@ async def process_summary(
     language: str,
     callback_url: Optional[str]
 ):
-    """Background task to process PDF and generate summary"""
+    """Background task entry point: waits for a free processing slot"""
+    async with state.summary_semaphore:
+        await _process_summary(state, file_id, storage_path, style, custom_instructions, language, callback_url)
+
+
+async def _process_summary(
+    state: State,
+    file_id: str,
+    storage_path: str,
+    style: str,
+    custom_instructions: Optional[str],
+    language: str,
+    callback_url: Optional[str]
+):
+    """Process PDF and generate summary (bounded by state.summary_semaphore)"""
     start_time = time.time()
+    summarizer = state.summarizer
+    minio_client = state.minio
     
     try:
-        logger.info(f"Processing summary for file: {file_id} (language: {language})")
+        logger.info("Processing summary for file: %s (language: %s)", file_id, language)
         
         # Download PDF from MinIO
         if not minio_client:
             raise ValueError("MinIO client not initialized")
         
-        response = minio_client.get_object(
+        pdf_bytes = await asyncio.to_thread(
+            read_object,
+            minio_client,
             settings.minio_bucket_files,
             storage_path
         )
-        pdf_bytes = response.read()
-        response.close()
-        response.release_conn()
         
-        logger.info(f"Downloaded PDF: {len(pdf_bytes)} bytes")
+        logger.info("Downloaded PDF: %d bytes", len(pdf_bytes))
         
         # Strict Validation
         if not await summarizer.validate_pdf(pdf_bytes):
             raise ValueError("Invalid PDF file. Header check failed.")
 
         # Extract text from PDF
-        text = pdf_extractor.extract_text(pdf_bytes)
+        text = await asyncio.to_thread(extract_text_cached, state, pdf_bytes)
         if not text.strip():
             raise ValueError("No text could be extracted from the PDF")
         
-        logger.info(f"Extracted text: {len(text)} characters")
+        logger.info("Extracted text: %d characters", len(text))
         
         # Generate summary with language
-        title, content, prompt_tokens, completion_tokens = summarizer.generate_summary(
+        title, content, prompt_tokens, completion_tokens = await summarizer.generate_summary_async(
             text=text,
             style=style,
             custom_instructions=custom_instructions,
@@ -403,10 +500,10 @@ async def process_summary(
         )
         
         processing_time_ms = int((time.time() - start_time) * 1000)
-        logger.info(f"Summary generated in {processing_time_ms}ms")
+        logger.info("Summary generated in %sms", processing_time_ms)
         
-        # Send result to callback
-        result = SummaryResult(
+        # Send result to callback (all fields produced here, so skip validation)
+        result = SummaryResult.model_construct(
             file_id=file_id,
             title=title,
             content=content,
@@ -419,14 +516,14 @@ async def process_summary(
             status="completed"
         )
         
-        await send_callback(callback_url, result)
+        await send_callback(state.http, callback_url, result)
         
     except Exception as e:
-        logger.error(f"Failed to process summary for {file_id}: {e}")
+        logger.error("Failed to process summary for %s: %s", file_id, e)
         processing_time_ms = int((time.time() - start_time) * 1000)
         
-        # Send error to callback
-        result = SummaryResult(
+        # Send error to callback (all fields produced here, so skip validation)
+        result = SummaryResult.model_construct(
             file_id=file_id,
             title="",
             content="",
@@ -440,25 +537,24 @@ async def process_summary(
             error_message=str(e)
         )
         
-        await send_callback(callback_url, result)
+        await send_callback(state.http, callback_url, result)
 
 
-async def send_callback(callback_url: Optional[str], result: SummaryResult):
-    """Send result to callback URL"""
+async def send_callback(client: httpx.AsyncClient, callback_url: Optional[str], result: SummaryResult):
+    """Send result to callback URL using the shared HTTP client"""
     if not callback_url:
         callback_url = f"{settings.backend_url}/api/v1/internal/summaries/callback"
     
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                callback_url,
-                json=result.model_dump(),
-                timeout=30.0
-            )
-            response.raise_for_status()
-            logger.info(f"Callback sent successfully to {callback_url}")
+        response = await client.post(
+            callback_url,
+            content=orjson.dumps(result.model_dump()),
+            headers={"Content-Type": "application/json"}
+        )
+        response.raise_for_status()
+        logger.info("Callback sent successfully to %s", callback_url)
     except Exception as e:
-        logger.error(f"Failed to send callback: {e}")
+        logger.error("Failed to send callback: %s", e)
 
 
 if __name__ == "__main__":
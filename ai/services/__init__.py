@@ -2,6 +2,9 @@
 from .pdf_extractor import PDFExtractor
 from .summarizer import Summarizer
 from .chunker import TextChunker
+from .storage import read_object
+from .cache import TTLCache, SQLiteCache, content_hash
+from .rate_limit import AsyncRateLimiter
 
-__all__ = ["PDFExtractor", "Summarizer", "TextChunker"]
+__all__ = ["PDFExtractor", "Summarizer", "TextChunker", "read_object", "TTLCache", "SQLiteCache", "content_hash", "AsyncRateLimiter"]
 
@@ -0,0 +1,187 @@
+"""
+Result Caching Service
+Content-addressed caches for extracted text and generated summaries
+(in-memory, or SQLite-backed for responses that should outlive the process)
+"""
+
+from collections import OrderedDict
+from typing import Any, Hashable, Optional, Sequence, Union
+import hashlib
+import sqlite3
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Seconds between sweeps of expired rows from a SQLiteCache (done by the next write)
+SQLITE_PURGE_INTERVAL = 3600
+
+
+def content_hash(data: Union[bytes, bytearray, str, Sequence[str]]) -> str:
+    """
+    Compute a compact content hash for cache keys
+
+    Args:
+        data: Raw bytes or text to hash, or a sequence of text parts
+            (hashed part by part, without joining them first)
+
+    Returns:
+        32-character hex digest (BLAKE2b, 16-byte digest)
+    """
+    if isinstance(data, (list, tuple)):
+        digest = hashlib.blake2b(digest_size=16)
+        for part in data:
+            digest.update(part.encode("utf-8"))
+            # Separator keeps part boundaries significant
+            digest.update(b"\0")
+        return digest.hexdigest()
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries expire after a fixed time-to-live"""
+
+    def __init__(self, maxsize: int = 512, ttl: float = 3600, max_total_len: Optional[int] = None):
+        """
+        Initialize the cache
+
+        Args:
+            maxsize: Maximum number of entries before least recently used ones are evicted
+            ttl: Seconds an entry stays valid after being stored
+            max_total_len: Optional bound on the summed len() of all values (e.g. characters
+                of cached text); least recently used entries are evicted to stay under it
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.max_total_len = max_total_len
+        self._data: "OrderedDict[Hashable, tuple[float, Any, int]]" = OrderedDict()
+        self._total_len = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Return the cached value, or None if missing or expired"""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, value, size = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                self._total_len -= size
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """Store a value, evicting least recently used entries when full"""
+        size = len(value) if self.max_total_len is not None else 0
+        if self.max_total_len is not None and size > self.max_total_len:
+            # Would evict everything else and still not fit
+            return
+        with self._lock:
+            previous = self._data.pop(key, None)
+            if previous is not None:
+                self._total_len -= previous[2]
+            self._data[key] = (time.monotonic() + self.ttl, value, size)
+            self._total_len += size
+            while len(self._data) > self.maxsize or (
+                self.max_total_len is not None and self._total_len > self.max_total_len
+            ):
+                _, (_, _, evicted_size) = self._data.popitem(last=False)
+                self._total_len -= evicted_size
+
+    def stats(self) -> dict:
+        """Hit/miss counters and current size"""
+        return {"hits": self.hits, "misses": self.misses, "size": len(self._data)}
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class SQLiteCache:
+    """
+    Persistent text cache with the TTLCache interface, stored in one SQLite table.
+
+    Entries survive restarts and are shared by every process pointing at the same
+    file (the API and the worker). Keys are strings such as `content_hash` digests.
+    Calls do blocking disk I/O (and may wait on another process's write lock), so
+    async code should run them in a thread. Database errors are logged and treated
+    as a miss (get) or a skipped write (set): the cache never fails its caller.
+    """
+
+    def __init__(self, path: str, ttl: float = 7 * 24 * 3600):
+        """
+        Open (or create) the cache database
+
+        Args:
+            path: SQLite database file
+            ttl: Seconds an entry stays valid after being stored
+        """
+        self.path = path
+        self.ttl = ttl
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, response TEXT NOT NULL, created_at REAL NOT NULL)"
+        )
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        # Drop entries that expired while no process was using them
+        with self._lock:
+            self._purge_expired()
+
+    def _purge_expired(self) -> None:
+        """Delete expired rows (caller holds the lock)"""
+        self._conn.execute("DELETE FROM responses WHERE created_at < ?", (time.time() - self.ttl,))
+        self._next_purge = time.monotonic() + SQLITE_PURGE_INTERVAL
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached value, or None if missing, expired or unreadable"""
+        with self._lock:
+            try:
+                row = self._conn.execute(
+                    "SELECT response, created_at FROM responses WHERE key = ?", (key,)
+                ).fetchone()
+            except sqlite3.Error as e:
+                logger.warning("Response cache read failed: %s", e)
+                row = None
+            if row is None or row[1] < time.time() - self.ttl:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return row[0]
+
+    def set(self, key: str, value: str) -> None:
+        """Store a value, replacing any previous entry for the key (and sweeping expired ones periodically)"""
+        with self._lock:
+            try:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO responses (key, response, created_at) VALUES (?, ?, ?)",
+                    (key, value, time.time())
+                )
+                if time.monotonic() >= self._next_purge:
+                    self._purge_expired()
+            except sqlite3.Error as e:
+                logger.warning("Response cache write failed: %s", e)
+
+    def stats(self) -> dict:
+        """Hit/miss counters and current size"""
+        return {"hits": self.hits, "misses": self.misses, "size": len(self)}
+
+    def __len__(self) -> int:
+        with self._lock:
+            try:
+                return self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+            except sqlite3.Error as e:
+                logger.warning("Response cache count failed: %s", e)
+                return 0
@@ -3,12 +3,30 @@ Text Chunking Service
 Splits large text into manageable chunks for LLM processing
 """
 
+from collections import defaultdict
+import asyncio
 from typing import List, Optional
 import re
+import string
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Pre-compiled patterns used on the chunking / merging hot paths
+# Markdown header line (# to ######) kept as its own split part
+_HEADER_SPLIT_RE = re.compile(r'(^#{1,6}\s+.+$)', re.MULTILINE)
+_HEADER_RE = re.compile(r'^#{1,6}\s+')
+_SENT_RE = re.compile(r'(?<=[.!?])\s+')
+_NUM_BULLET_RE = re.compile(r'^\d+\.\s')
+_NUM_BULLET_STRIP_RE = re.compile(r'^\d+\.\s*')
+# Translation table deleting ASCII punctuation (bullet normalization)
+_STRIP_TABLE = {c: None for c in map(ord, string.punctuation)}
+
+
+def _is_section_header(line: str) -> bool:
+    """Markdown '## ' heading or a standalone **bold** line"""
+    return line.startswith('## ') or (line.startswith('**') and line.endswith('**'))
+
 
 class TextChunker:
     """Handles text chunking for LLM processing"""
@@ -32,6 +50,10 @@ class TextChunker:
         self.separator = separator
     
     async def chunk_text(self, text: str) -> List[str]:
+        """Split text into chunks in a worker thread so the event loop stays responsive"""
+        return await asyncio.to_thread(self.chunk_text_sync, text)
+
+    def chunk_text_sync(self, text: str) -> List[str]:
         """
         Split text into chunks suitable for LLM processing.
         Priority:
@@ -48,13 +70,15 @@ class TextChunker:
         # 1. Try splitting by Markdown Headers first (Smart Chunking)
         header_sections = self._split_by_headers(text)
         
-        current_chunk = ""
+        # Accumulate parts and track the joined length instead of re-concatenating
+        current_parts: List[str] = []
+        current_len = 0
         for section in header_sections:
             # If section itself is too large, fall back to paragraph splitting
             if len(section) > self.max_chunk_size:
-                if current_chunk:
-                    chunks.append(current_chunk.strip())
-                    current_chunk = ""
+                if current_len:
+                    chunks.append("".join(current_parts).strip())
+                    current_parts, current_len = [], 0
                 
                 # Recursive paragraph splitting
                 sub_chunks = self._split_by_paragraphs(section)
@@ -62,32 +86,29 @@ class TextChunker:
                 continue
 
             # Check if adding this section exceeds limit
-            test_chunk = current_chunk + "\n\n" + section if current_chunk else section
-            
-            if len(test_chunk) <= self.max_chunk_size:
-                current_chunk = test_chunk
+            if not current_len:
+                current_parts, current_len = [section], len(section)
+            elif current_len + 2 + len(section) <= self.max_chunk_size:
+                current_parts += ("\n\n", section)
+                current_len += 2 + len(section)
             else:
-                if current_chunk:
-                    chunks.append(current_chunk.strip())
+                current_chunk = "".join(current_parts)
+                chunks.append(current_chunk.strip())
                 
                 # Start new chunk with overlap
                 overlap = self._get_overlap(current_chunk)
-                current_chunk = overlap + section if overlap else section
+                current_parts = [overlap, section] if overlap else [section]
+                current_len = len(overlap) + len(section)
         
-        if current_chunk:
-            chunks.append(current_chunk.strip())
+        if current_len:
+            chunks.append("".join(current_parts).strip())
             
-        logger.info(f"Split text into {len(chunks)} chunks (Smart Mode)")
+        logger.info("Split text into %d chunks (Smart Mode)", len(chunks))
         return chunks
 
     def _split_by_headers(self, text: str) -> List[str]:
         """Split text by markdown headers (#, ##), keeping headers with content"""
-        # Regex to find headers at start of line
-        # capturing group 1: header markers (# to ######)
-        # capturing group 2: rest of the title
-        pattern = r'(^#{1,6}\s+.+$)'
-        
-        parts = re.split(pattern, text, flags=re.MULTILINE)
+        parts = _HEADER_SPLIT_RE.split(text)
         sections = []
         current_section = ""
         
@@ -96,7 +117,7 @@ class TextChunker:
                 continue
                 
             # Check if part is a header
-            if re.match(r'^#{1,6}\s+', part):
+            if _HEADER_RE.match(part):
                 # If we have a current section, save it
                 if current_section:
                     sections.append(current_section)
@@ -114,27 +135,32 @@ class TextChunker:
         chunks = []
         paragraphs = self._split_by_separator(text, self.separator)
         
-        current_chunk = ""
+        sep_len = len(self.separator)
+        current_parts: List[str] = []
+        current_len = 0
         for para in paragraphs:
             if len(para) > self.max_chunk_size:
-                if current_chunk:
-                    chunks.append(current_chunk.strip())
-                    current_chunk = ""
+                if current_len:
+                    chunks.append("".join(current_parts).strip())
+                    current_parts, current_len = [], 0
                 sub_chunks = self._split_large_paragraph(para)
                 chunks.extend(sub_chunks)
                 continue
             
-            test_chunk = current_chunk + self.separator + para if current_chunk else para
-            if len(test_chunk) <= self.max_chunk_size:
-                current_chunk = test_chunk
+            if not current_len:
+                current_parts, current_len = [para], len(para)
+            elif current_len + sep_len + len(para) <= self.max_chunk_size:
+                current_parts += (self.separator, para)
+                current_len += sep_len + len(para)
             else:
-                if current_chunk:
-                    chunks.append(current_chunk.strip())
+                current_chunk = "".join(current_parts)
+                chunks.append(current_chunk.strip())
                 overlap = self._get_overlap(current_chunk)
-                current_chunk = overlap + para if overlap else para
+                current_parts = [overlap, para] if overlap else [para]
+                current_len = len(overlap) + len(para)
                 
-        if current_chunk:
-            chunks.append(current_chunk.strip())
+        if current_len:
+            chunks.append("".join(current_parts).strip())
             
         return chunks
     
@@ -146,18 +172,18 @@ class TextChunker:
     def _split_large_paragraph(self, paragraph: str) -> List[str]:
         """Split a large paragraph by sentences"""
         # Split by sentence endings
-        sentence_pattern = r'(?<=[.!?])\s+'
-        sentences = re.split(sentence_pattern, paragraph)
+        sentences = _SENT_RE.split(paragraph)
         
         chunks = []
-        current_chunk = ""
+        current_parts: List[str] = []
+        current_len = 0
         
         for sentence in sentences:
             if len(sentence) > self.max_chunk_size:
                 # Sentence itself is too long, force split by characters
-                if current_chunk:
-                    chunks.append(current_chunk.strip())
-                    current_chunk = ""
+                if current_len:
+                    chunks.append("".join(current_parts).strip())
+                    current_parts, current_len = [], 0
                 
                 # Force split
                 for i in range(0, len(sentence), self.max_chunk_size - self.overlap_size):
@@ -165,47 +191,51 @@ class TextChunker:
                     chunks.append(chunk)
                 continue
             
-            test_chunk = current_chunk + " " + sentence if current_chunk else sentence
-            
-            if len(test_chunk) <= self.max_chunk_size:
-                current_chunk = test_chunk
+            if not current_len:
+                current_parts, current_len = [sentence], len(sentence)
+            elif current_len + 1 + len(sentence) <= self.max_chunk_size:
+                current_parts += (" ", sentence)
+                current_len += 1 + len(sentence)
             else:
-                if current_chunk:
-                    chunks.append(current_chunk.strip())
-                current_chunk = sentence
+                chunks.append("".join(current_parts).strip())
+                current_parts, current_len = [sentence], len(sentence)
         
-        if current_chunk:
-            chunks.append(current_chunk.strip())
+        if current_len:
+            chunks.append("".join(current_parts).strip())
         
         return chunks
     
     def _get_overlap(self, text: str) -> str:
         """Get the overlap portion from the end of text"""
-        if not text or len(text) < self.overlap_size:
+        if not self.overlap_size or not text or len(text) < self.overlap_size:
             return ""
         
         # Try to find a good break point (end of sentence or paragraph)
         overlap_text = text[-self.overlap_size:]
         
         # Find last sentence boundary in overlap
-        last_period = overlap_text.rfind('. ')
-        if last_period > 0:
-            return overlap_text[last_period + 2:]
+        head, _, tail = overlap_text.rpartition('. ')
+        if head:
+            return tail
         
         # Find last word boundary
-        last_space = overlap_text.rfind(' ')
-        if last_space > 0:
-            return overlap_text[last_space + 1:]
+        head, _, tail = overlap_text.rpartition(' ')
+        if head:
+            return tail
         
         return overlap_text
     
-    def merge_summaries(self, summaries: List[str], style: str = "bullet_points") -> str:
+    def merge_summaries(
+        self, summaries: List[str], style: str = "bullet_points", truncate: bool = True
+    ) -> str:
         """
         Merge multiple chunk summaries into a final summary
         
         Args:
             summaries: List of summaries from each chunk
             style: Summary style for formatting
+            truncate: Cap the output (20 bullet points, 50 lines per section, 30 other
+                lines); with False no content is dropped
             
         Returns:
             Merged summary text
@@ -226,7 +256,10 @@ class TextChunker:
             
             # Deduplicate similar bullets
             unique_bullets = self._deduplicate_bullets(all_bullets)
-            return "\n".join(f"• {b}" for b in unique_bullets[:20])  # Limit to 20 items
+            if not unique_bullets:
+                # No bullet markup to merge on; keep the text rather than drop it
+                return "\n\n".join(summaries)
+            return "\n".join(f"• {b}" for b in (unique_bullets[:20] if truncate else unique_bullets))
         
         elif style in ["paragraph", "executive"]:
             # Combine as paragraphs
@@ -234,7 +267,7 @@ class TextChunker:
         
         elif style in ["detailed", "academic"]:
             # Merge with section awareness
-            return self._merge_structured_summaries(summaries)
+            return self._merge_structured_summaries(summaries, truncate)
         
         else:
             return "\n\n---\n\n".join(summaries)
@@ -249,8 +282,8 @@ class TextChunker:
             # Match various bullet formats
             if line.startswith(('• ', '- ', '* ', '· ')):
                 bullets.append(line[2:].strip())
-            elif re.match(r'^\d+\.\s', line):
-                bullets.append(re.sub(r'^\d+\.\s*', '', line))
+            elif _NUM_BULLET_RE.match(line):
+                bullets.append(_NUM_BULLET_STRIP_RE.sub('', line))
         
         return bullets
     
@@ -264,8 +297,7 @@ class TextChunker:
         
         for bullet in bullets:
             # Normalize for comparison
-            normalized = bullet.lower().strip()
-            normalized = re.sub(r'[^\w\s]', '', normalized)
+            normalized = bullet.lower().translate(_STRIP_TABLE).strip()
             
             # Check similarity with existing
             if normalized not in seen_normalized and len(normalized) > 10:
@@ -274,22 +306,23 @@ class TextChunker:
         
         return unique
     
-    def _merge_structured_summaries(self, summaries: List[str]) -> str:
-        """Merge structured summaries (detailed/academic)"""
-        sections = {}
+    def _merge_structured_summaries(self, summaries: List[str], truncate: bool = True) -> str:
+        """Merge structured summaries (detailed/academic); text before a summary's first header leads the output"""
+        sections = defaultdict(list)
+        preamble = []
         other_content = []
         
         for summary in summaries:
-            # Extract sections by headers
+            # Extract sections by headers in a single pass
             current_section = None
             current_content = []
             
-            for line in summary.split('\n'):
-                if line.startswith('## ') or line.startswith('**') and line.endswith('**'):
+            for line in summary.splitlines():
+                if _is_section_header(line):
                     if current_section and current_content:
-                        if current_section not in sections:
-                            sections[current_section] = []
                         sections[current_section].extend(current_content)
+                    elif any(l.strip() for l in current_content):
+                        preamble.extend(current_content)
                     
                     current_section = line.strip('#* ')
                     current_content = []
@@ -298,19 +331,19 @@ class TextChunker:
             
             # Handle last section
             if current_section and current_content:
-                if current_section not in sections:
-                    sections[current_section] = []
                 sections[current_section].extend(current_content)
             elif current_content:
                 other_content.extend(current_content)
         
         # Build merged output
         output_parts = []
+        if preamble:
+            output_parts.append('\n'.join(preamble).strip())
         for section, content in sections.items():
             output_parts.append(f"## {section}")
-            output_parts.append('\n'.join(content[:50]))  # Limit content
+            output_parts.append('\n'.join(content[:50] if truncate else content))  # Limit content
         
         if other_content:
-            output_parts.append('\n'.join(other_content[:30]))
+            output_parts.append('\n'.join(other_content[:30] if truncate else other_content))
         
         return '\n\n'.join(output_parts)
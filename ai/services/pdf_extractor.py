@@ -5,45 +5,155 @@ Extracts text content from PDF files using PyMuPDF
 
 import fitz  # PyMuPDF
 from io import BytesIO
-from typing import Optional
+from typing import BinaryIO, List, Optional, Tuple, Union
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import multiprocessing
 import logging
+import os
+import re
+import threading
 
 logger = logging.getLogger(__name__)
 
+# Documents with at least this many pages are extracted across worker processes.
+# PyMuPDF is not thread-safe and holds the GIL, so parallelism has to be process-based.
+PARALLEL_MIN_PAGES = 32
+MAX_EXTRACT_WORKERS = min(8, os.cpu_count() or 1)
+
+# Scanned / image-only detection: if the first pages yield almost no text, stop early
+SCANNED_PROBE_PAGES = 3
+SCANNED_MIN_CHARS = 50
+
+# Whitespace normalization applied to each page: control characters left by
+# extraction are dropped, runs of spaces/tabs/form feeds become one space and
+# runs of blank lines one paragraph break (what the chunker splits on)
+_CONTROL_CHARS_RE = re.compile(r"[\x00-\x08\x0e-\x1f\x7f]")
+_INLINE_SPACE_RE = re.compile(r"[ \t\f\v\r]+")
+_BLANK_LINES_RE = re.compile(r"\n(?: ?\n)+")
+
+# PyMuPDF is not thread-safe, and extraction and validation run on worker threads:
+# every fitz call made in this process holds this lock. Only the large-document page
+# fan-out runs without it, in the process pool.
+FITZ_LOCK = threading.Lock()
+
+_executor: Optional[ProcessPoolExecutor] = None
+# Guards creating and dropping the shared pool (extractions run on several threads)
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    """Lazily create the shared extraction process pool"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(
+                max_workers=MAX_EXTRACT_WORKERS,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return _executor
+
+
+def _reset_executor(broken: ProcessPoolExecutor) -> None:
+    """Drop a broken process pool so the next parallel extraction starts a fresh one"""
+    global _executor
+    with _executor_lock:
+        # Another thread may already have replaced it
+        if _executor is broken:
+            _executor = None
+    broken.shutdown(wait=False, cancel_futures=True)
+
+
+def _extract_page_range(pdf_bytes: Union[bytes, bytearray], start: int, stop: int) -> List[Tuple[int, str]]:
+    """Extract text of pages [start, stop) with a document opened in this process"""
+    doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+    try:
+        return [(i, doc.load_page(i).get_text("text")) for i in range(start, stop)]
+    finally:
+        doc.close()
+
+
+def _extract_pages_parallel(pdf_bytes: Union[bytes, bytearray], first: int, page_count: int) -> List[Tuple[int, str]]:
+    """Split pages [first, page_count) into one slice per worker and extract them concurrently"""
+    step = -(-(page_count - first) // MAX_EXTRACT_WORKERS)  # ceil division
+    executor = _get_executor()
+    pages = []
+    try:
+        futures = [
+            executor.submit(_extract_page_range, pdf_bytes, start, min(start + step, page_count))
+            for start in range(first, page_count, step)
+        ]
+        for future in futures:
+            pages.extend(future.result())
+    except BrokenProcessPool:
+        _reset_executor(executor)
+        raise
+    return pages
+
 
 class PDFExtractor:
     """Handles PDF text extraction"""
     
     @staticmethod
-    def extract_text(pdf_bytes: bytes) -> str:
+    def extract_text(pdf_bytes: Union[bytes, bytearray, BinaryIO]) -> str:
         """
         Extract text from PDF bytes
         
         Args:
-            pdf_bytes: Raw PDF file content
+            pdf_bytes: Raw PDF file content (bytes, bytearray or a file-like stream)
             
         Returns:
             Extracted text from all pages
         """
         try:
-            doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+            if not isinstance(pdf_bytes, (bytes, bytearray)):
+                pdf_bytes = pdf_bytes.read()
+
+            with FITZ_LOCK:
+                doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+                try:
+                    page_count = len(doc)
+
+                    # Probe the first pages so scanned PDFs fail before a full traversal
+                    probe_count = min(SCANNED_PROBE_PAGES, page_count)
+                    pages = [(i, doc.load_page(i).get_text("text")) for i in range(probe_count)]
+                    if page_count > probe_count and sum(len(t.strip()) for _, t in pages) < SCANNED_MIN_CHARS:
+                        logger.warning("No text in first %s of %s pages, treating PDF as scanned", probe_count, page_count)
+                        raise ValueError("PDF appears to be scanned / image-only")
+
+                    parallel = page_count - probe_count >= PARALLEL_MIN_PAGES and MAX_EXTRACT_WORKERS > 1
+                    if not parallel:
+                        pages.extend((i, doc.load_page(i).get_text("text")) for i in range(probe_count, page_count))
+                finally:
+                    doc.close()
+
+            # The lock is not held while worker processes extract the remaining pages
+            if parallel:
+                try:
+                    pages.extend(_extract_pages_parallel(pdf_bytes, probe_count, page_count))
+                except BrokenProcessPool as e:
+                    # A worker died (e.g. killed for memory); this document is extracted
+                    # serially and the next one gets a new pool
+                    logger.warning("Extraction process pool broke (%s); extracting pages serially", e)
+                    with FITZ_LOCK:
+                        pages.extend(_extract_page_range(pdf_bytes, probe_count, page_count))
+
             text_parts = []
-            
-            for page_num in range(len(doc)):
-                page = doc.load_page(page_num)
-                text = page.get_text("text")
+            for page_num, text in pages:
+                # Layout padding is dropped once here, so it is never hashed, chunked or sent to Gemini
+                text = _BLANK_LINES_RE.sub("\n\n", _INLINE_SPACE_RE.sub(" ", _CONTROL_CHARS_RE.sub("", text)))
                 if text.strip():
                     text_parts.append(f"--- Page {page_num + 1} ---\n{text}")
             
-            doc.close()
-            
             full_text = "\n\n".join(text_parts)
-            logger.info(f"Extracted {len(full_text)} characters from {len(text_parts)} pages")
+            logger.info("Extracted %d characters from %d pages", len(full_text), len(text_parts))
             
             return full_text
             
+        except ValueError:
+            raise
         except Exception as e:
-            logger.error(f"Failed to extract text from PDF: {e}")
+            logger.error("Failed to extract text from PDF: %s", e)
             raise ValueError(f"Failed to extract text from PDF: {str(e)}")
     
     @staticmethod
@@ -58,12 +168,13 @@ class PDFExtractor:
             Number of pages
         """
         try:
-            doc = fitz.open(stream=pdf_bytes, filetype="pdf")
-            page_count = len(doc)
-            doc.close()
+            with FITZ_LOCK:
+                doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+                page_count = len(doc)
+                doc.close()
             return page_count
         except Exception as e:
-            logger.error(f"Failed to get page count: {e}")
+            logger.error("Failed to get page count: %s", e)
             return 0
     
     @staticmethod
@@ -78,10 +189,11 @@ class PDFExtractor:
             Dictionary containing PDF metadata
         """
         try:
-            doc = fitz.open(stream=pdf_bytes, filetype="pdf")
-            metadata = doc.metadata
-            page_count = len(doc)
-            doc.close()
+            with FITZ_LOCK:
+                doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+                metadata = doc.metadata
+                page_count = len(doc)
+                doc.close()
             
             return {
                 "title": metadata.get("title", ""),
@@ -91,5 +203,5 @@ class PDFExtractor:
                 "page_count": page_count,
             }
         except Exception as e:
-            logger.error(f"Failed to extract metadata: {e}")
+            logger.error("Failed to extract metadata: %s", e)
             return {"page_count": 0}
@@ -0,0 +1,56 @@
+"""
+Rate Limiting Service
+Token-bucket limiter that paces outgoing API calls across all in-flight tasks
+"""
+
+import asyncio
+import threading
+import time
+
+
+class AsyncRateLimiter:
+    """
+    Token bucket allowing `max_rate` calls per `time_period` seconds.
+
+    Callers reserve a slot under a short thread lock and sleep outside it, so
+    the limiter is not bound to one event loop and can be shared by the API
+    loop, the worker's loop and threaded callers (e.g. `generate_summary`,
+    which runs its own loop) alike.
+    """
+
+    def __init__(self, max_rate: float, time_period: float = 60):
+        """
+        Initialize the limiter
+
+        Args:
+            max_rate: Calls allowed per time period (also the burst size)
+            time_period: Length of the period in seconds
+        """
+        self.max_rate = max_rate
+        self.time_period = time_period
+        self._rate = max_rate / time_period
+        self._tokens = float(max_rate)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _reserve(self) -> float:
+        """Take one token (possibly going into debt) and return seconds to wait for it"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.max_rate, self._tokens + (now - self._updated) * self._rate)
+            self._updated = now
+            self._tokens -= 1
+            return 0.0 if self._tokens >= 0 else -self._tokens / self._rate
+
+    async def acquire(self) -> None:
+        """Wait until a call may start"""
+        delay = self._reserve()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    async def __aenter__(self) -> "AsyncRateLimiter":
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        return None
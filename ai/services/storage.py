@@ -0,0 +1,36 @@
+"""
+Object Storage Helpers
+Reads PDF objects from MinIO without buffering the HTTP body twice
+"""
+
+from minio import Minio
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Read size for streamed object downloads (1 MiB)
+DOWNLOAD_CHUNK_SIZE = 1 << 20
+
+
+def read_object(client: Minio, bucket: str, object_name: str, chunk_size: int = DOWNLOAD_CHUNK_SIZE) -> bytearray:
+    """
+    Download an object into a single growing buffer
+
+    Args:
+        client: MinIO client
+        bucket: Bucket name
+        object_name: Path of the object in the bucket
+        chunk_size: Bytes read per network chunk
+
+    Returns:
+        Object content (bytearray is accepted by PyMuPDF as-is)
+    """
+    response = client.get_object(bucket, object_name)
+    try:
+        content = bytearray()
+        for chunk in response.stream(chunk_size):
+            content += chunk
+        return content
+    finally:
+        response.close()
+        response.release_conn()
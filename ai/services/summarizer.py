@@ -4,24 +4,96 @@ Generates summaries using Google Generative AI (Gemini) with chunking support
 """
 
 import asyncio
+from contextlib import aclosing
 import google.generativeai as genai
-from typing import Optional, Tuple, List, AsyncGenerator
+from google.api_core import exceptions as google_exceptions
+from typing import Callable, Optional, Tuple, List, AsyncGenerator, Union
 import logging
 import time
-import io
-from pydantic import BaseModel
-from pypdf import PdfReader
+import re
+import weakref
+import random
+import orjson
+from functools import lru_cache, partial
+from string import Template
+import fitz  # PyMuPDF
 
 from config import get_settings
 from .chunker import TextChunker
+from .pdf_extractor import FITZ_LOCK
+from .cache import TTLCache, SQLiteCache, content_hash
+from .rate_limit import AsyncRateLimiter
+
+__all__ = [
+    "Summarizer",
+    "STYLE_PROMPTS_EN",
+    "STYLE_PROMPTS_ID",
+    "LANGUAGE_INSTRUCTIONS",
+    "VALID_STYLES",
+    "VALID_LANGUAGES",
+]
 
 logger = logging.getLogger(__name__)
 
-# Maximum characters before chunking is applied
-MAX_SINGLE_CHUNK_SIZE = 500000 
+# Chunking threshold and chunk concurrency come from settings
+# (GEMINI_MAX_CHUNK_CHARS, GEMINI_MAX_CONCURRENT)
 MAX_RECURSIVE_DEPTH = 3
-MAX_CONCURRENT_CHUNKS = 5
 MAX_RETRIES = 3
+# Retry waits are drawn uniformly from [0, min(2 ** attempt * 2, RETRY_MAX_BACKOFF)] ("full jitter")
+RETRY_MAX_BACKOFF = 30
+# Client errors worth retrying (quota/rate limit); other 4xx fail on the first attempt
+_RETRYABLE_CLIENT_ERRORS = (google_exceptions.ResourceExhausted, google_exceptions.TooManyRequests)
+_RETRY_DELAY_RE = re.compile(r"retry in (\d+(?:\.\d+)?)\s*s|retry_delay\s*\{\s*seconds:\s*(\d+)", re.IGNORECASE)
+# Consecutive chunks summarized together in one JSON-output call (cuts requests per level by this factor)
+CHUNK_BATCH_SIZE = 5
+CHUNK_BATCH_MAX_OUTPUT_TOKENS = 8192
+# Chunk summaries beyond this count are tree-reduced in groups of this size before the final merge
+MERGE_FAN_IN = 8
+# Up to this many chunk summaries totalling fewer characters are merged locally, without Gemini
+LOCAL_MERGE_MAX_SUMMARIES = 3
+LOCAL_MERGE_MAX_CHARS = 4000
+# Styles for which that short-summary local merge applies: paragraphs are simply joined.
+# Executive summaries would repeat their single "Bottom Line", and detailed/academic
+# ones need their sections merged, so those always get the merge call
+SHORT_LOCAL_MERGE_STYLES = frozenset({"paragraph"})
+# Styles whose chunk summaries merge structurally (bullets are concatenated and deduplicated,
+# after the usual tree reduction); only a short title call is made
+LOCAL_MERGE_STYLES = frozenset({"bullet_points"})
+
+# Streamed output: flush coalesced tokens at least every TOKEN_FLUSH_INTERVAL seconds,
+# or once the pending batch reaches a size that grows 1, 3, 9, 27, ... up to the cap
+TOKEN_FLUSH_INTERVAL = 0.075
+TOKEN_BATCH_GROWTH_FACTOR = 3
+TOKEN_BATCH_MAX = 50
+
+# Gemini responses cached by hash of model, generation config and prompt
+# (prompt embeds style, language, instructions and text)
+RESPONSE_CACHE_SIZE = 1024
+RESPONSE_CACHE_TTL = 3600
+# Lifetime of entries in the persistent (RESPONSE_CACHE_PATH) response cache
+PERSISTENT_CACHE_TTL = 7 * 24 * 3600
+# Finished stream results cached by (text hash, style, language, custom instructions)
+RESULT_CACHE_SIZE = 256
+
+# Rough characters-per-token ratio, used when the API omits usage_metadata and to size output caps
+CHARS_PER_TOKEN_ESTIMATE = 4
+# Lowest max_output_tokens given to a call, however short its input
+MIN_OUTPUT_TOKENS = 512
+
+# Leading characters searched for the TITLE:/SUMMARY: markers (streamed title and parsing)
+TITLE_SCAN_LIMIT = 512
+# Leading characters of a locally merged summary sent to the title call
+TITLE_INPUT_CHARS = 4000
+
+# "TITLE: ...\n...SUMMARY: ..." model output; title is the first non-empty line
+# after TITLE: (the rest of its line, or the next line if the model wrapped it)
+_TITLE_SUMMARY_RE = re.compile(
+    r"TITLE:\s*(?P<title>(?:(?!SUMMARY:)[^\n])*).*?SUMMARY:", re.DOTALL
+)
+
+# Structural PDF check: trailer markers are looked for in the last PDF_TRAILER_WINDOW bytes
+PDF_TRAILER_WINDOW = 1024
+_PDF_PAGE_RE = re.compile(rb"/Type\s*/Page[^s]")
 
 # Summary style prompts (English)
 STYLE_PROMPTS_EN = {
@@ -107,6 +179,257 @@ LANGUAGE_INSTRUCTIONS = {
 # For backward compatibility
 STYLE_PROMPTS = STYLE_PROMPTS_EN
 
+# Styles listed by the /styles endpoint, built once
+AVAILABLE_STYLES = [
+    {"id": "bullet_points", "name": "Bullet Points"},
+    {"id": "paragraph", "name": "Paragraph"},
+    {"id": "detailed", "name": "Detailed Analysis"},
+    {"id": "executive", "name": "Executive Summary"},
+    {"id": "academic", "name": "Academic Style"}
+]
+
+# Human-readable style names used inside prompts ("bullet_points" -> "bullet points")
+_STYLE_LABELS = {style: style.replace("_", " ") for style in STYLE_PROMPTS_EN}
+
+# Accepted request values (single source of truth for API validation)
+VALID_STYLES = frozenset(STYLE_PROMPTS_EN)
+VALID_LANGUAGES = frozenset(LANGUAGE_INSTRUCTIONS)
+
+# Prompt templates (static instructions first, document content last so the
+# prompt prefix stays cacheable). $language, $style and $style_name are filled
+# once per (style, language) below; $custom and the content fields per call.
+_PROMPT_TEMPLATES = {
+    "document": """
+LANGUAGE REQUIREMENT: $language
+STYLE: $style
+$custom
+
+TASK:
+1. Analyze the document below.
+2. Provide a concise title and the summary content.
+
+DOCUMENT CONTENT:
+---
+$content
+---
+""",
+    "single": """
+LANGUAGE REQUIREMENT: $language
+STYLE: $style
+$custom
+
+TASK:
+1. Use strict accuracy.
+2. Provide:
+   TITLE: [Title]
+   SUMMARY:
+   [Content]
+
+DOCUMENT CONTENT:
+---
+$content
+---
+""",
+    "chunk_system": """
+LANGUAGE: $language
+STYLE: $style
+$custom
+
+Provide a summary of the document section you are given.
+""",
+    "chunk": """
+Part $index/$total of document.
+CONTENT:
+---
+$content
+---
+""",
+    "chunk_batch": """
+Summarize each of the $count document parts below separately, in order.
+Return exactly one summary per part in "sections".
+
+$content
+""",
+    "combine": """
+LANGUAGE: $language
+Combine the partial summaries below, which cover consecutive parts of one document,
+into a single summary. Preserve every key point, figure and name. Do not add a title
+or change the formatting style.
+
+SUMMARIES:
+$content
+""",
+    "merge": """
+LANGUAGE: $language
+Merge the summaries below into one cohesive $style_name summary.
+
+Format:
+TITLE: [Concise Title]
+SUMMARY:
+[Unified Summary]
+
+SUMMARIES:
+$content
+""",
+    "title": """
+LANGUAGE: $language
+Write a concise title for the document summarized below.
+Reply with the title only.
+
+SUMMARY:
+$content
+""",
+}
+
+# Label used for the optional custom instructions line, per prompt kind
+_CUSTOM_LABELS = {"document": "INSTRUCTIONS", "single": "INSTRUCTIONS", "chunk_system": "Instructions", "chunk": None, "chunk_batch": None, "combine": None, "merge": None, "title": None}
+
+
+def _build_prompts() -> dict:
+    """Pre-fill the static parts of every prompt template per (kind, style, language)"""
+    built = {}
+    for language, lang_instruction in LANGUAGE_INSTRUCTIONS.items():
+        prompts = STYLE_PROMPTS_ID if language == "id" else STYLE_PROMPTS_EN
+        for style, style_prompt in prompts.items():
+            for kind, template in _PROMPT_TEMPLATES.items():
+                built[(kind, style, language)] = Template(
+                    Template(template).safe_substitute(
+                        language=lang_instruction, style=style_prompt, style_name=_STYLE_LABELS[style]
+                    )
+                )
+    return built
+
+
+PROMPTS = _build_prompts()
+
+# A prompt is either one string or a list of text parts sent as separate Parts
+Prompt = Union[str, List[str]]
+# Marks where content goes when a template is split into head and tail parts
+_CONTENT_MARK = "\x00"
+_PART_SEPARATOR = "\n\n"
+
+
+def _estimate_tokens(text: "Prompt") -> int:
+    """O(1)-per-part token estimate from character length (no tokenization pass)"""
+    length = len(text) if isinstance(text, str) else sum(map(len, text))
+    return length // CHARS_PER_TOKEN_ESTIMATE
+
+
+@lru_cache(maxsize=1)
+def _get_model() -> Optional[genai.GenerativeModel]:
+    """Configure the Gemini client once per process and return the shared model (None without an API key)"""
+    settings = get_settings()
+    if not settings.gemini_api_key:
+        return None
+    genai.configure(api_key=settings.gemini_api_key)
+    return genai.GenerativeModel(settings.gemini_model)
+
+
+@lru_cache(maxsize=32)
+def _get_instructed_model(system_instruction: str) -> genai.GenerativeModel:
+    """Model carrying the static chunk instructions (one per style, language and custom instructions)"""
+    return genai.GenerativeModel(get_settings().gemini_model, system_instruction=system_instruction)
+
+
+def _output_cap(input_chars: int, ceiling: int) -> int:
+    """
+    Output token cap scaled to the input: a summary never needs more tokens than
+    its source. At least MIN_OUTPUT_TOKENS, rounded up to a power of two so only
+    a few distinct configs exist, and never above `ceiling`.
+    """
+    tokens = max(MIN_OUTPUT_TOKENS, input_chars // CHARS_PER_TOKEN_ESTIMATE)
+    return min(ceiling, 1 << (tokens - 1).bit_length())
+
+
+@lru_cache(maxsize=8)
+def _get_generation_config(max_output_tokens: int = 4096) -> genai.types.GenerationConfig:
+    """Shared generation config for summary calls (one per output cap)"""
+    # Tuning params for accuracy/creativity balance
+    return genai.types.GenerationConfig(
+        temperature=0.2,   # Lower temperature for more focused/accurate results
+        top_p=0.8,         # Nucleus sampling
+        top_k=40,          # Top-k sampling
+        max_output_tokens=max_output_tokens
+    )
+
+
+# JSON schema for non-streamed document summaries (structured output)
+SUMMARY_RESPONSE_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "title": {"type": "string"},
+        "content": {"type": "string"},
+    },
+    "required": ["title", "content"],
+}
+
+
+@lru_cache(maxsize=1)
+def _get_document_generation_config() -> genai.types.GenerationConfig:
+    """Generation config for non-streamed summaries: same sampling, JSON output"""
+    return genai.types.GenerationConfig(
+        temperature=0.2,
+        top_p=0.8,
+        top_k=40,
+        max_output_tokens=4096,
+        response_mime_type="application/json",
+        response_schema=SUMMARY_RESPONSE_SCHEMA
+    )
+
+
+CHUNK_BATCH_RESPONSE_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "sections": {"type": "array", "items": {"type": "string"}},
+    },
+    "required": ["sections"],
+}
+
+
+@lru_cache(maxsize=8)
+def _get_chunk_batch_generation_config(max_output_tokens: int) -> genai.types.GenerationConfig:
+    """Generation config for batched chunk calls: chunk sampling, one JSON section per chunk"""
+    return genai.types.GenerationConfig(
+        temperature=0.2,
+        top_p=0.8,
+        top_k=40,
+        max_output_tokens=max_output_tokens,
+        response_mime_type="application/json",
+        response_schema=CHUNK_BATCH_RESPONSE_SCHEMA
+    )
+
+
+@lru_cache(maxsize=8)
+def _get_chunk_generation_config(max_output_tokens: int = 1024) -> genai.types.GenerationConfig:
+    """Shared generation config for chunk calls (one per output cap)"""
+    return genai.types.GenerationConfig(
+        temperature=0.2,
+        top_p=0.8,
+        top_k=40,
+        max_output_tokens=max_output_tokens
+    )
+
+
+@lru_cache(maxsize=1)
+def _get_merge_generation_config() -> genai.types.GenerationConfig:
+    """
+    Greedy decoding for merge and combine calls: merging is aggregation, not
+    generation, so sampling adds nothing and deterministic output lets the
+    response cache hit on reruns
+    """
+    return genai.types.GenerationConfig(
+        temperature=0.0,
+        top_p=1.0,
+        top_k=1,
+        max_output_tokens=4096
+    )
+
+
+@lru_cache(maxsize=1)
+def _get_chunker() -> TextChunker:
+    """Shared chunker (12k char limit, CHUNK_OVERLAP char overlap); it holds no per-call state"""
+    return TextChunker(max_chunk_size=12000, overlap_size=get_settings().chunk_overlap)
+
 class Summarizer:
     """Handles AI-powered summarization using Google Gemini with recursive chunking"""
     
@@ -115,8 +438,8 @@ class Summarizer:
         Initialize the Summarizer service with Google Gemini configuration.
         
         Configuration Details:
-        - **Chunker**: Initializes TextChunker with 12k char limit and 500 char overlap 
-          to preserve context between segments.
+        - **Chunker**: Shared TextChunker with a 12k char limit; chunks end on section,
+          paragraph or sentence boundaries, with CHUNK_OVERLAP chars of overlap (0 by default).
         - **Model**: Configures 'gemini-2.5-flash' (or env var) for optimal speed/quality balance.
         - **Generation Config**:
             - `temperature=0.2`: Low randomness for factual, consistent summaries.
@@ -124,44 +447,89 @@ class Summarizer:
             - `top_k=40`: Limits vocabulary to top 40 likely next words.
             - `max_output_tokens=4096`: Caps response length to prevent runaways.
         """
+        # Model, config and chunker are process-wide singletons, so extra
+        # instances (e.g. the worker's) don't reconfigure the client
+        self.chunker = _get_chunker()
+        self.model = _get_model()
+        self.generation_config = _get_generation_config() if self.model else None
         settings = get_settings()
-        self.chunker = TextChunker(max_chunk_size=12000, overlap_size=500)
-        
-        if settings.gemini_api_key:
-            genai.configure(api_key=settings.gemini_api_key)
-            self.model = genai.GenerativeModel(settings.gemini_model)
-            # Tuning params for accuracy/creativity balance
-            self.generation_config = genai.types.GenerationConfig(
-                temperature=0.2,   # Lower temperature for more focused/accurate results
-                top_p=0.8,         # Nucleus sampling
-                top_k=40,          # Top-k sampling
-                max_output_tokens=4096
-            )
+        # Responses persist across restarts (and are shared with the worker) when a cache file is set
+        if settings.response_cache_path:
+            self.response_cache = SQLiteCache(settings.response_cache_path, ttl=PERSISTENT_CACHE_TTL)
         else:
-            self.model = None
-            self.generation_config = None
+            self.response_cache = TTLCache(maxsize=RESPONSE_CACHE_SIZE, ttl=RESPONSE_CACHE_TTL)
+        self.result_cache = TTLCache(maxsize=RESULT_CACHE_SIZE, ttl=RESPONSE_CACHE_TTL)
+        # Paces every Gemini call made by this instance (shared across requests)
+        self.rate_limiter = AsyncRateLimiter(settings.gemini_requests_per_minute, 60)
+        self.max_single_chunk_size = settings.gemini_max_chunk_chars
+        # More concurrent chunks than calls allowed per minute would only queue on the limiter
+        self.max_concurrent_chunks = max(1, min(settings.gemini_max_concurrent, settings.gemini_requests_per_minute))
+        # Gemini calls in flight at once (chunk, merge, document and streamed calls alike).
+        # The shared model objects only build requests, so concurrent calls on them are safe
+        self.max_inflight_calls = max(1, settings.gemini_max_inflight)
+        # Semaphores are bound to an event loop, so each loop gets its own
+        # (the API and worker each run one; sync callers use asyncio.run)
+        self._semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = weakref.WeakKeyDictionary()
+        self._call_semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = weakref.WeakKeyDictionary()
+        if self.model is None:
             logger.warning("Gemini API key not configured")
 
+    @staticmethod
+    def _loop_semaphore(registry: weakref.WeakKeyDictionary, size: int) -> asyncio.Semaphore:
+        """The running loop's semaphore from `registry`, created with `size` slots on first use"""
+        loop = asyncio.get_running_loop()
+        semaphore = registry.get(loop)
+        if semaphore is None:
+            semaphore = registry[loop] = asyncio.Semaphore(size)
+        return semaphore
+
+    def _chunk_semaphore(self) -> asyncio.Semaphore:
+        """Semaphore capping in-flight chunk calls across all summaries on the running loop"""
+        return self._loop_semaphore(self._semaphores, self.max_concurrent_chunks)
+
+    def _call_semaphore(self) -> asyncio.Semaphore:
+        """Semaphore capping all in-flight Gemini calls on the running loop"""
+        return self._loop_semaphore(self._call_semaphores, self.max_inflight_calls)
+
     async def validate_pdf(self, file_content: bytes) -> bool:
+        """
+        Strictly validate PDF file content without blocking the event loop.
+        
+        The checks run in a worker thread; see `_validate_pdf_sync`.
+        """
+        return await asyncio.to_thread(self._validate_pdf_sync, file_content)
+
+    @staticmethod
+    def _validate_pdf_sync(file_content: bytes) -> bool:
         """
         Strictly validate PDF file content.
         
         Process:
         1. Magic Number Check: Verifies the file starts with specific PDF signature bytes (`%PDF-`).
            This is a fast, first-pass check to reject non-PDF files immediately.
-        2. Structural Integrity: Uses `pypdf` library to attempt parsing the file structure.
-           - Creates an in-memory byte stream (`io.BytesIO`).
-           - Attempts to read the PDF trailer and page tree.
-           - Checks if the document contains at least one valid page.
+        2. Structural Scan: Looks for `startxref` and `%%EOF` near the end of the file and
+           for at least one `/Type /Page` object, without parsing the document.
+        3. Fallback: If the scan misses (e.g. pages stored in compressed object streams),
+           opens the document with PyMuPDF (C parser, under `FITZ_LOCK`) and checks for at least one page.
            
         Returns:
             bool: True if file is a valid, readable PDF; False otherwise.
         """
         if not file_content.startswith(b'%PDF-'):
             return False
+        
+        tail_start = max(0, len(file_content) - PDF_TRAILER_WINDOW)
+        if (
+            file_content.rfind(b'%%EOF', tail_start) != -1
+            and file_content.rfind(b'startxref', tail_start) != -1
+            and _PDF_PAGE_RE.search(file_content)
+        ):
+            return True
+        
         try:
-            reader = PdfReader(io.BytesIO(file_content))
-            return len(reader.pages) > 0
+            # Shares the extractor's lock: PyMuPDF is not thread-safe
+            with FITZ_LOCK, fitz.open(stream=file_content, filetype="pdf") as doc:
+                return doc.page_count > 0
         except Exception:
             return False
 
@@ -173,65 +541,97 @@ class Summarizer:
         title_hint: Optional[str] = None,
         language: str = "en"
     ) -> Tuple[str, str, int, int]:
-        """Synchronous wrapper for backward compatibility"""
-        logger.warning("Using synchronous generate_summary wrapper. Use stream for parallel processing.")
-        
-        loop = asyncio.new_event_loop()
-        try:
-            return loop.run_until_complete(
-                self._generate_summary_async(text, style, custom_instructions, title_hint, language)
-            )
-        finally:
-            loop.close()
+        """Blocking wrapper for callers without a running event loop; async code should await `generate_summary_async`"""
+        return asyncio.run(
+            self.generate_summary_async(text, style, custom_instructions, title_hint, language)
+        )
 
-    async def _generate_summary_async(
+    async def generate_summary_async(
         self,
         text: str,
-        style: str,
-        custom_instructions: Optional[str],
-        title_hint: Optional[str],
-        language: str
+        style: str = "bullet_points",
+        custom_instructions: Optional[str] = None,
+        title_hint: Optional[str] = None,
+        language: str = "en"
     ) -> Tuple[str, str, int, int]:
-        """Async version of simple summary (legacy path, not used by stream)"""
-        # This is a fallback or for non-stream uses
-        prompts = STYLE_PROMPTS_ID if language == "id" else STYLE_PROMPTS_EN
-        style_prompt = prompts.get(style, prompts["bullet_points"])
-        lang_instruction = LANGUAGE_INSTRUCTIONS.get(language, LANGUAGE_INSTRUCTIONS["en"])
+        """
+        Summarize text without streaming.
         
-        full_prompt = f"""
-LANGUAGE REQUIREMENT: {lang_instruction}
-STYLE: {style_prompt}
-{f"INSTRUCTIONS: {custom_instructions}" if custom_instructions else ""}
-
-DOCUMENT CONTENT:
----
-{text}
----
-
-TASK:
-1. Analyze the document.
-2. Provide a title and summary.
-
-Format:
-TITLE: [Concise Title]
-SUMMARY:
-[Summary Content]
-"""
-        response = await self.model.generate_content_async(
-            full_prompt,
-            generation_config=self.generation_config
-        )
+        Text that fits in one call gets a single structured-output request; longer
+        text goes through the chunked pipeline of `generate_summary_stream`.
         
-        # Approximate tokens if not provided
-        prompt_tokens = int(len(full_prompt) / 4) 
-        completion_tokens = int(len(response.text) / 4)
+        Returns:
+            Tuple of (title, summary, prompt_tokens, completion_tokens)
+        """
+        if not self.model:
+            raise RuntimeError("Gemini API key not configured")
+        
+        # The stream checks the result cache itself
+        if len(text) > self.max_single_chunk_size:
+            result = await self._collect_result(
+                self.generate_summary_stream(text, style, custom_instructions, language)
+            )
+            return result["title"], result["content"], result["prompt_tokens"], result["completion_tokens"]
         
-        if response.usage_metadata:
-             prompt_tokens = response.usage_metadata.prompt_token_count
-             completion_tokens = response.usage_metadata.candidates_token_count
+        result_key = self._result_key(text, style, language, custom_instructions)
+        cached_result = self.result_cache.get(result_key)
+        if cached_result is not None:
+            # No tokens were spent on a cached summary
+            return cached_result["title"], cached_result["content"], 0, 0
         
-        title, summary = self._parse_response(response.text, title_hint)
-        return title, summary, prompt_tokens, completion_tokens
+        full_prompt = self._build_prompt("document", style, language, text, custom_instructions)
+        tokens = {"prompt": 0, "completion": 0}
+        
+        generation_config = _get_document_generation_config()
+        cache_key = self._cache_key(full_prompt, generation_config)
+        response_text = await self._cache_get(cache_key)
+        if response_text is None:
+            response = await self._request(self.model, full_prompt, generation_config, "Document")
+            response_text = response.text
+            self._record_usage(response, tokens, full_prompt, response_text)
+            await self._cache_set(cache_key, response_text)
+        
+        title, summary = self._parse_json_response(response_text, title_hint)
+        self.result_cache.set(result_key, {
+            "title": title,
+            "content": summary,
+            "style": style,
+            "language": language,
+            "model_used": "gemini-2.5-flash",
+            "prompt_tokens": tokens["prompt"],
+            "completion_tokens": tokens["completion"],
+            "processing_duration_ms": 0
+        })
+        return title, summary, tokens["prompt"], tokens["completion"]
+
+    @staticmethod
+    def _result_key(
+        text: str,
+        style: str,
+        language: str,
+        custom_instructions: Optional[str]
+    ) -> tuple:
+        """
+        Result cache key for a document's text and its options.
+        
+        The text is hashed as is (the extractor already normalizes whitespace);
+        instructions only have whitespace runs collapsed. They are not case-folded,
+        since they reach the prompt verbatim and case can change their meaning.
+        """
+        document_key = content_hash(text)
+        instructions = " ".join((custom_instructions or "").split())
+        return (document_key, style, language, instructions)
+
+    @staticmethod
+    async def _collect_result(events: AsyncGenerator[dict, None]) -> dict:
+        """Drain a summary event stream and return its `result` payload (raises on `error`)"""
+        async with aclosing(events):
+            async for event in events:
+                if "error" in event:
+                    raise RuntimeError(event["error"])
+                if "result" in event:
+                    return event["result"]
+        raise RuntimeError("Summary stream ended without a result")
 
     async def generate_summary_stream(
         self,
@@ -245,18 +645,20 @@ SUMMARY:
         
         This method implements a Recursive Chunking Strategy:
         1. **Analysis**: Checks total text length.
-        2. **Recursive Processing** (`process_text`):
-           - If text <= `MAX_SINGLE_CHUNK_SIZE`: Summarizes directly.
-           - If text > `MAX_SINGLE_CHUNK_SIZE`: 
+        2. **Level Loop** (up to `MAX_RECURSIVE_DEPTH` levels):
+           - If text <= `max_single_chunk_size`: Summarizes directly.
+           - If text > `max_single_chunk_size`: 
              a. Splits text into chunks using `TextChunker` (preserves sentence boundaries).
-             b. Processes chunks in parallel using `asyncio.gather`.
+             b. Processes chunks in parallel, collected in completion order.
              c. Merges chunk summaries.
-             d. If merged summary is still too large, recurses to next level.
+             d. If merged summary is still too large, repeats at the next level.
              
         Yields:
             dict: Event objects containing:
                 - `log`: Status message for frontend progress updates.
-                - `final_text`: The completed summary text.
+                - `token`: Partial text of the final summary as it is generated (coalesced).
+                - `title`: Title of the final summary, sent as soon as its line has streamed.
+                - `final_text`: The completed summary text (internal, not forwarded).
                 - `result`: Final object with title, content, and token usage.
                 - `error`: Error message if failure occurs.
         """
@@ -264,87 +666,139 @@ SUMMARY:
             yield {"error": "Gemini API key not configured"}
             return
 
+        # Whole-document results are cached by text hash and options, so re-opening
+        # or re-summarizing the same document skips the pipeline entirely
+        result_key = self._result_key(text, style, language, custom_instructions)
+        cached_result = self.result_cache.get(result_key)
+        if cached_result is not None:
+            yield {"log": "Using cached summary for this document."}
+            # No tokens were spent on a cached summary
+            yield {"result": {**cached_result, "prompt_tokens": 0, "completion_tokens": 0}}
+            return
+
         total_tokens = {"prompt": 0, "completion": 0}
         
         try:
             yield {"log": f"Analyzing document ({len(text)} chars)..."}
             
-            async def process_text(current_text: str, depth: int = 1):
+            # Each level either finishes with a single streamed call or shrinks the
+            # text by summarizing its chunks; the final call is streamed once, after the loop
+            semaphore = self._chunk_semaphore()
+            # Style, language and instructions are fixed for the whole document
+            build_chunk_prompt = self._prompt_builder("chunk", style, language)
+            build_batch_prompt = partial(self._build_prompt_parts, "chunk_batch", style, language)
+            # Static chunk instructions go in the system instruction; each chunk call sends only its part
+            chunk_instruction = self._build_prompt("chunk_system", style, language, "", custom_instructions)
+            current_text, depth = text, 1
+            while True:
                 if depth > MAX_RECURSIVE_DEPTH:
                     yield {"log": f"Max recursive depth reached at level {depth}. Summarizing directly."}
-                    res = await self._summarize_single_async(current_text, style, custom_instructions, language, total_tokens)
-                    yield {"final_text": res}
-                    return
+                    final_stream = self._summarize_single_async(current_text, style, custom_instructions, language, total_tokens)
+                    break
 
-                if len(current_text) <= MAX_SINGLE_CHUNK_SIZE:
+                if len(current_text) <= self.max_single_chunk_size:
                     yield {"log": "Processing single chunk..."}
-                    res = await self._summarize_single_async(current_text, style, custom_instructions, language, total_tokens)
-                    yield {"final_text": res}
-                    return
+                    final_stream = self._summarize_single_async(current_text, style, custom_instructions, language, total_tokens)
+                    break
                 
                 yield {"log": f"Chunking text (Level {depth})..."}
                 chunks = await self.chunker.chunk_text(current_text)
                 yield {"log": f"Created {len(chunks)} chunks. Processing in parallel..."}
                 
-                semaphore = asyncio.Semaphore(MAX_CONCURRENT_CHUNKS)
-                
-                tasks = []
-                for i, chunk in enumerate(chunks):
-                    yield {"log": f"Queued chunk {i+1}/{len(chunks)}..."}
-                    task = self._summarize_chunk_async(
-                        chunk, style, custom_instructions, i, len(chunks), language, total_tokens, semaphore
-                    )
-                    tasks.append(task)
+                # Batches of consecutive chunks are admitted as semaphore slots free up and
+                # collected in completion order, so one slow batch does not hold back progress events
+                indexed = list(enumerate(chunks))
+                tasks = [
+                    asyncio.create_task(self._summarize_chunk_batch_async(
+                        indexed[start:start + CHUNK_BATCH_SIZE], build_chunk_prompt, build_batch_prompt,
+                        chunk_instruction, len(chunks), total_tokens, semaphore
+                    ))
+                    for start in range(0, len(chunks), CHUNK_BATCH_SIZE)
+                ]
+                yield {"log": f"Queued chunks 1-{len(chunks)} in {len(tasks)} batches..."}
                 
+                chunk_summaries = [""] * len(chunks)
+                level_start = time.monotonic()
                 try:
-                    chunk_summaries = await asyncio.gather(*tasks)
+                    completed = 0
+                    for next_done in asyncio.as_completed(tasks):
+                        batch_results = await next_done
+                        for index, chunk_summary in batch_results:
+                            chunk_summaries[index] = chunk_summary
+                        completed += len(batch_results)
+                        first, last = batch_results[0][0] + 1, batch_results[-1][0] + 1
+                        done = f"Chunk {first}" if first == last else f"Chunks {first}-{last}"
+                        yield {"log": f"{done} done ({completed}/{len(chunks)} complete)"}
+                    logger.info(
+                        "Processed %d chunks at level %d in %.2fs",
+                        len(chunks), depth, time.monotonic() - level_start
+                    )
                     yield {"log": f"All {len(chunks)} chunks processed successfully."}
                 except Exception as e:
                     yield {"error": f"Parallel processing failed: {str(e)}"}
                     raise e
+                finally:
+                    # Also reached when the consumer closes the stream (client disconnect)
+                    for task in tasks:
+                        if not task.done():
+                            task.cancel()
 
                 yield {"log": "Merging chunk summaries..."}
-                merged_text = "\n\n".join(chunk_summaries)
+                # Size of the joined summaries, computed without joining them
+                merged_len = sum(map(len, chunk_summaries)) + len(_PART_SEPARATOR) * (len(chunk_summaries) - 1)
                 
-                if len(merged_text) > MAX_SINGLE_CHUNK_SIZE:
-                    yield {"log": f"Merged summary is still large ({len(merged_text)} chars). Recursively summarizing (Level {depth+1})..."}
-                    async for event in process_text(merged_text, depth + 1):
-                        yield event
-                    return
+                if merged_len > self.max_single_chunk_size:
+                    yield {"log": f"Merged summary is still large ({merged_len} chars). Recursively summarizing (Level {depth+1})..."}
+                    current_text, depth = _PART_SEPARATOR.join(chunk_summaries), depth + 1
+                    continue
+                
+                # Decided on the chunk summaries themselves, never on combined group summaries
+                # (only bullet points, whose combines keep the bullets, still merge locally after reduction)
+                merge_locally = self._merges_locally(chunk_summaries, style)
+                if len(chunk_summaries) > MERGE_FAN_IN:
+                    yield {"log": f"Combining {len(chunk_summaries)} chunk summaries in groups of {MERGE_FAN_IN}..."}
+                    chunk_summaries = await self._reduce_summaries(chunk_summaries, style, language, total_tokens, semaphore)
                 
                 yield {"log": "Finalizing merged summary..."}
-                res = await self._merge_chunk_summaries_async(chunk_summaries, style, language, total_tokens)
-                yield {"final_text": res}
+                final_stream = self._merge_chunk_summaries_async(
+                    chunk_summaries, style, language, total_tokens, merge_locally
+                )
+                break
 
             final_summary = ""
-            async for event in process_text(text):
+            # Streamed text up to the SUMMARY: marker, so the title can be sent early
+            head = ""
+            title_pending = True
+            async for event in final_stream:
                 if "final_text" in event:
                     final_summary = event["final_text"]
-                else:
-                    yield event
+                    continue
+                if title_pending and "token" in event:
+                    head += event["token"]
+                    if "SUMMARY:" in head:
+                        title_pending = False
+                        yield {"title": self._parse_response(head)[0]}
+                    elif len(head) > TITLE_SCAN_LIMIT:
+                        title_pending = False
+                yield event
             
-            title = "Document Summary"
-            if "TITLE:" in final_summary:
-                parts = final_summary.split("SUMMARY:", 1)
-                if len(parts) == 2:
-                    title = parts[0].replace("TITLE:", "").strip().split("\n")[0]
-                    final_summary = parts[1].strip()
+            title, final_summary = self._parse_response(final_summary)
             
-            yield {
-                "result": {
-                    "title": title,
-                    "content": final_summary,
-                    "style": style,
-                    "language": language,
-                    "model_used": "gemini-2.5-flash",
-                    "prompt_tokens": total_tokens["prompt"],
-                    "completion_tokens": total_tokens["completion"],
-                    "processing_duration_ms": 0  # Will be calculated by backend
-                }
+            result = {
+                "title": title,
+                "content": final_summary,
+                "style": style,
+                "language": language,
+                "model_used": "gemini-2.5-flash",
+                "prompt_tokens": total_tokens["prompt"],
+                "completion_tokens": total_tokens["completion"],
+                "processing_duration_ms": 0  # Will be calculated by backend
             }
+            self.result_cache.set(result_key, result)
+            yield {"result": dict(result)}
             
         except Exception as e:
-            logger.error(f"Stream summarization failed: {e}")
+            logger.error("Stream summarization failed: %s", e)
             yield {"error": str(e)}
 
     async def _summarize_single_async(
@@ -354,156 +808,488 @@ SUMMARY:
         custom_instructions: Optional[str],
         language: str,
         tokens_dict: dict
-    ) -> str:
-        """Async version of single chunk summary"""
-        prompts = STYLE_PROMPTS_ID if language == "id" else STYLE_PROMPTS_EN
-        style_prompt = prompts.get(style, prompts["bullet_points"])
-        lang_instruction = LANGUAGE_INSTRUCTIONS.get(language, LANGUAGE_INSTRUCTIONS["en"])
-        
-        full_prompt = f"""
-LANGUAGE REQUIREMENT: {lang_instruction}
-STYLE: {style_prompt}
-{f"INSTRUCTIONS: {custom_instructions}" if custom_instructions else ""}
-
-DOCUMENT CONTENT:
----
-{text}
----
-
-TASK:
-1. User strict accuracy.
-2. Provide:
-   TITLE: [Title]
-   SUMMARY:
-   [Content]
-"""
-        response = await self.model.generate_content_async(
-            full_prompt,
-            generation_config=self.generation_config
-        )
-        
-        if response.usage_metadata:
-             tokens_dict["prompt"] += response.usage_metadata.prompt_token_count
-             tokens_dict["completion"] += response.usage_metadata.candidates_token_count
-        
-        return response.text
+    ) -> AsyncGenerator[dict, None]:
+        """Async version of single chunk summary, streamed as `token` events then `final_text`"""
+        full_prompt = self._build_prompt("single", style, language, text, custom_instructions)
+        generation_config = _get_generation_config(_output_cap(len(text), 4096))
+        async for event in self._stream_generate(full_prompt, generation_config, tokens_dict):
+            yield event
 
     async def _summarize_chunk_async(
         self, 
         chunk: str, 
-        style: str, 
-        custom_instructions: Optional[str], 
+        build_prompt: Callable[..., str],
+        system_instruction: str,
         index: int, 
         total: int, 
+        tokens_dict: dict,
+        semaphore: asyncio.Semaphore
+    ) -> Tuple[int, str]:
+        """Process a single chunk asynchronously. Returns (index, summary) for completion-order collection"""
+        prompt = build_prompt(chunk, index=index + 1, total=total)
+        summary = await self._generate(
+            prompt, tokens_dict, semaphore, f"Chunk {index+1}",
+            system_instruction=system_instruction,
+            generation_config=_get_chunk_generation_config(_output_cap(len(chunk), 1024)),
+            # Keyed by chunk text alone, so the same text hits wherever it falls in a document
+            cache_parts=[chunk]
+        )
+        return index, summary
+
+    async def _summarize_chunk_batch_async(
+        self,
+        batch: List[Tuple[int, str]],
+        build_prompt: Callable[..., str],
+        build_batch_prompt: Callable[..., List[str]],
+        system_instruction: str,
+        total: int,
+        tokens_dict: dict,
+        semaphore: asyncio.Semaphore
+    ) -> List[Tuple[int, str]]:
+        """
+        Summarize consecutive (index, chunk) pairs with one JSON-output call.
+        
+        Chunks with a cached summary are skipped, and each new summary is cached
+        under its chunk's own key. If the reply does not hold one summary per
+        chunk, those chunks fall back to separate calls. Returns (index, summary)
+        pairs in index order.
+        """
+        results = []
+        pending = []
+        for index, chunk in batch:
+            cached = await self._cache_get(self._chunk_cache_key(chunk, system_instruction))
+            if cached is None:
+                pending.append((index, chunk))
+            else:
+                results.append((index, cached))
+        
+        if len(pending) == 1:
+            index, chunk = pending[0]
+            results.append(await self._summarize_chunk_async(
+                chunk, build_prompt, system_instruction, index, total, tokens_dict, semaphore
+            ))
+        elif pending:
+            prompt = build_batch_prompt(
+                [build_prompt(chunk, index=index + 1, total=total) for index, chunk in pending],
+                count=len(pending)
+            )
+            max_output_tokens = min(
+                CHUNK_BATCH_MAX_OUTPUT_TOKENS,
+                sum(_output_cap(len(chunk), 1024) for _, chunk in pending)
+            )
+            response_text = await self._generate(
+                prompt, tokens_dict, semaphore, f"Chunks {pending[0][0]+1}-{pending[-1][0]+1}",
+                system_instruction=system_instruction,
+                generation_config=_get_chunk_batch_generation_config(max_output_tokens)
+            )
+            summaries = self._parse_batch_response(response_text, len(pending))
+            if summaries is None:
+                logger.warning(
+                    "Batch reply for chunks %d-%d did not match; summarizing them separately",
+                    pending[0][0] + 1, pending[-1][0] + 1
+                )
+                results.extend(await asyncio.gather(*(
+                    self._summarize_chunk_async(chunk, build_prompt, system_instruction, index, total, tokens_dict, semaphore)
+                    for index, chunk in pending
+                )))
+            else:
+                for (index, chunk), summary in zip(pending, summaries):
+                    await self._cache_set(self._chunk_cache_key(chunk, system_instruction), summary)
+                    results.append((index, summary))
+        
+        results.sort()
+        return results
+
+    @staticmethod
+    def _chunk_cache_key(chunk: str, system_instruction: str) -> str:
+        """Cache key of a chunk's summary, as used by `_summarize_chunk_async`"""
+        return Summarizer._cache_key(
+            [system_instruction, chunk], _get_chunk_generation_config(_output_cap(len(chunk), 1024))
+        )
+
+    @staticmethod
+    def _parse_batch_response(response_text: str, count: int) -> Optional[List[str]]:
+        """Section summaries from a batched chunk reply, or None unless it holds exactly `count` non-empty ones"""
+        try:
+            sections = orjson.loads(response_text).get("sections")
+        except (orjson.JSONDecodeError, AttributeError):
+            return None
+        if not isinstance(sections, list) or len(sections) != count:
+            return None
+        if not all(isinstance(section, str) and section.strip() for section in sections):
+            return None
+        return [section.strip() for section in sections]
+
+    async def _reduce_summaries(
+        self,
+        summaries: List[str],
+        style: str,
         language: str,
         tokens_dict: dict,
         semaphore: asyncio.Semaphore
+    ) -> List[str]:
+        """
+        Tree-reduce chunk summaries before the final merge.
+        
+        Summaries are combined in groups of MERGE_FAN_IN, all groups of a level in
+        parallel, until at most MERGE_FAN_IN remain; a trailing single summary is
+        carried over unchanged. Intermediate combines keep the
+        key points without restyling; the style is applied once by the final merge.
+        """
+        level = 0
+        while len(summaries) > MERGE_FAN_IN:
+            level += 1
+            groups = [summaries[i:i + MERGE_FAN_IN] for i in range(0, len(summaries), MERGE_FAN_IN)]
+            # A trailing single summary has nothing to combine with; carry it to the next level
+            leftover = groups.pop()[0] if len(groups[-1]) == 1 else None
+            tasks = [
+                asyncio.create_task(self._generate(
+                    self._build_prompt_parts("combine", style, language, group),
+                    tokens_dict,
+                    semaphore,
+                    f"Merge group {n+1} (level {level})",
+                    generation_config=_get_merge_generation_config()
+                ))
+                for n, group in enumerate(groups)
+            ]
+            try:
+                summaries = list(await asyncio.gather(*tasks))
+                if leftover is not None:
+                    summaries.append(leftover)
+            except Exception:
+                for task in tasks:
+                    task.cancel()
+                raise
+        return summaries
+
+    async def _generate(
+        self,
+        prompt: Prompt,
+        tokens_dict: dict,
+        semaphore: asyncio.Semaphore,
+        label: str,
+        system_instruction: Optional[str] = None,
+        generation_config: Optional[genai.types.GenerationConfig] = None,
+        cache_parts: Optional[List[str]] = None
     ) -> str:
-        """Process a single chunk asynchronously"""
+        """
+        Non-streamed Gemini call for intermediate summaries, with response caching and retries.
+        
+        With `system_instruction`, the call goes to a model carrying those
+        instructions and `prompt` holds only the per-call content. The chunk
+        generation config is used unless `generation_config` is given.
+        `cache_parts` replaces the prompt in the cache key when the response
+        depends only on part of it (e.g. a chunk's text, not its position).
+        """
+        sent_parts = [prompt] if isinstance(prompt, str) else prompt
+        if system_instruction:
+            model = _get_instructed_model(system_instruction)
+            # The instructions are part of what the response depends on
+            sent_parts = [system_instruction, *sent_parts]
+        else:
+            model = self.model
+        if cache_parts is None:
+            key_parts = sent_parts
+        else:
+            key_parts = ([system_instruction] if system_instruction else []) + cache_parts
+        generation_config = generation_config or _get_chunk_generation_config()
+        cache_key = self._cache_key(key_parts, generation_config)
+        cached = await self._cache_get(cache_key)
+        if cached is not None:
+            return cached
+        
         async with semaphore:
-            prompts = STYLE_PROMPTS_ID if language == "id" else STYLE_PROMPTS_EN
-            style_prompt = prompts.get(style, prompts["bullet_points"])
-            lang_instruction = LANGUAGE_INSTRUCTIONS.get(language, LANGUAGE_INSTRUCTIONS["en"])
+            response = await self._request(model, prompt, generation_config, label)
+        
+        self._record_usage(response, tokens_dict, sent_parts, response.text)
+        await self._cache_set(cache_key, response.text)
+        return response.text
 
-            prompt = f"""
-Part {index + 1}/{total} of document.
-LANGUAGE: {lang_instruction}
-STYLE: {style_prompt}
-{f"Instructions: {custom_instructions}" if custom_instructions else ""}
+    async def _cache_get(self, key: str) -> Optional[str]:
+        """Response cache lookup; the persistent (SQLite) cache is read in a thread, off the event loop"""
+        if isinstance(self.response_cache, SQLiteCache):
+            return await asyncio.to_thread(self.response_cache.get, key)
+        return self.response_cache.get(key)
 
-CONTENT:
----
-{chunk}
----
+    async def _cache_set(self, key: str, value: str) -> None:
+        """Response cache store; the persistent (SQLite) cache is written in a thread, off the event loop"""
+        if isinstance(self.response_cache, SQLiteCache):
+            await asyncio.to_thread(self.response_cache.set, key, value)
+        else:
+            self.response_cache.set(key, value)
 
-Provide a summary of this section.
-"""
-            
-            for attempt in range(MAX_RETRIES):
-                try:
-                    response = await self.model.generate_content_async(
+    async def _request(
+        self,
+        model: genai.GenerativeModel,
+        prompt: Prompt,
+        generation_config: genai.types.GenerationConfig,
+        label: str,
+        stream: bool = False
+    ):
+        """
+        Start a Gemini call, paced by the rate limiter and retried with backoff.
+        
+        Server errors, timeouts and rate limits are retried up to MAX_RETRIES
+        times; other client errors (bad request, auth) are raised at once. For
+        streams only opening the stream is retried, not failures mid-stream.
+        Non-streamed calls take an in-flight slot here; streams hold theirs in
+        `_stream_generate` until fully read.
+        """
+        for attempt in range(MAX_RETRIES):
+            try:
+                if stream:
+                    await self.rate_limiter.acquire()
+                    return await model.generate_content_async(
                         prompt,
-                        generation_config=genai.types.GenerationConfig(
-                            temperature=0.2,
-                            top_p=0.8,
-                            top_k=40,
-                            max_output_tokens=1024
-                        )
+                        generation_config=generation_config,
+                        stream=True
                     )
-                    
-                    if response.usage_metadata:
-                        tokens_dict["prompt"] += response.usage_metadata.prompt_token_count
-                        tokens_dict["completion"] += response.usage_metadata.candidates_token_count
-                    
-                    return response.text
+                async with self._call_semaphore():
+                    await self.rate_limiter.acquire()
+                    return await model.generate_content_async(
+                        prompt,
+                        generation_config=generation_config
+                    )
+            except Exception as e:
+                if isinstance(e, google_exceptions.ClientError) and not isinstance(e, _RETRYABLE_CLIENT_ERRORS):
+                    raise
+                if attempt == MAX_RETRIES - 1:
+                    logger.error("%s failed after %d attempts: %s", label, MAX_RETRIES, e)
+                    raise
                 
-                except Exception as e:
-                    is_rate_limit = "429" in str(e) or "Too Many Requests" in str(e) or "quota" in str(e).lower()
-                    
-                    if attempt < MAX_RETRIES - 1:
-                        wait_time = (2 ** attempt) * 2
-                        if is_rate_limit:
-                            logger.warning(f"Chunk {index+1} hit rate limit. Retrying in {wait_time}s...")
-                        else:
-                            logger.warning(f"Chunk {index+1} failed ({str(e)}). Retrying in {wait_time}s...")
-                        
-                        await asyncio.sleep(wait_time)
-                    else:
-                        logger.error(f"Chunk {index+1} failed after {MAX_RETRIES} attempts: {e}")
-                        raise e
-            return ""
-
-    async def _merge_chunk_summaries_async(self, summaries: List[str], style: str, language: str, tokens_dict: dict) -> str:
-        """Merge summaries asynchronously"""
-        combined = "\n\n".join(summaries)
-        lang_instruction = LANGUAGE_INSTRUCTIONS.get(language, LANGUAGE_INSTRUCTIONS["en"])
-        
-        prompt = f"""
-Merge these summaries into one cohesive {style} summary.
-LANGUAGE: {lang_instruction}
+                wait_time = self._retry_delay(e, attempt)
+                if isinstance(e, _RETRYABLE_CLIENT_ERRORS) or "429" in str(e) or "quota" in str(e).lower():
+                    logger.warning("%s hit rate limit. Retrying in %.1fs...", label, wait_time)
+                else:
+                    logger.warning("%s failed (%s). Retrying in %.1fs...", label, e, wait_time)
+                await asyncio.sleep(wait_time)
 
-SUMMARIES:
-{combined}
+    @staticmethod
+    def _merges_locally(summaries: List[str], style: str) -> bool:
+        """Whether a level's chunk summaries can be merged without a Gemini call (not for combined summaries)"""
+        if style in LOCAL_MERGE_STYLES:
+            return True
+        if style not in SHORT_LOCAL_MERGE_STYLES:
+            return False
+        return len(summaries) <= LOCAL_MERGE_MAX_SUMMARIES and sum(map(len, summaries)) < LOCAL_MERGE_MAX_CHARS
 
-Format:
-TITLE: [Concise Title]
-SUMMARY:
-[Unified Summary]
-"""
-        response = await self.model.generate_content_async(
-            prompt,
-            generation_config=self.generation_config
-        )
+    async def _merge_chunk_summaries_async(
+        self, summaries: List[str], style: str, language: str, tokens_dict: dict, merge_locally: bool = False
+    ) -> AsyncGenerator[dict, None]:
+        """
+        Merge summaries asynchronously, streamed as `token` events then `final_text`.
         
-        if response.usage_metadata:
-             tokens_dict["prompt"] += response.usage_metadata.prompt_token_count
-             tokens_dict["completion"] += response.usage_metadata.candidates_token_count
-             
-        return response.text
+        With `merge_locally` (see `_merges_locally`, checked by the caller on the
+        chunk summaries before any reduction) the chunker merges them and only a
+        short title call is made; the local merge is also the fallback if the
+        merge call fails before producing any output.
+        """
+        if merge_locally:
+            merged = await self._merge_locally(summaries, style, language, tokens_dict)
+            yield {"token": merged}
+            yield {"final_text": merged}
+            return
+        
+        prompt = self._build_prompt_parts("merge", style, language, summaries)
+        started = False
+        try:
+            async for event in self._stream_generate(prompt, _get_merge_generation_config(), tokens_dict):
+                started = True
+                yield event
+        except Exception as e:
+            if started:
+                raise
+            logger.warning("Merge call failed (%s); merging chunk summaries locally", e)
+            merged = await self._merge_locally(summaries, style, language, tokens_dict)
+            yield {"token": merged}
+            yield {"final_text": merged}
 
-    def _parse_response(self, response_text: str, title_hint: Optional[str] = None) -> Tuple[str, str]:
-        """Parse the model response to extract title and summary"""
-        title = title_hint or "Document Summary"
-        summary = response_text
+    async def _merge_locally(self, summaries: List[str], style: str, language: str, tokens_dict: dict) -> str:
+        """
+        Merge summaries with the chunker (nothing truncated) and head the
+        result with a title from a short title call, in the `TITLE:`/`SUMMARY:`
+        format of the merge call. Without a title the merged text is returned as is.
+        """
+        merged = self.chunker.merge_summaries(summaries, style, truncate=False)
+        try:
+            title = await self._generate(
+                self._build_prompt("title", style, language, merged[:TITLE_INPUT_CHARS]),
+                tokens_dict, self._chunk_semaphore(), "Title",
+                generation_config=_get_chunk_generation_config(MIN_OUTPUT_TOKENS)
+            )
+        except Exception as e:
+            logger.warning("Title call failed (%s); using the default title", e)
+            return merged
+        title = " ".join(title.split()).strip(" *#\"'")
+        return f"TITLE: {title}\nSUMMARY:\n{merged}" if title else merged
+
+    async def _stream_generate(
+        self,
+        prompt: Prompt,
+        generation_config,
+        tokens_dict: dict
+    ) -> AsyncGenerator[dict, None]:
+        """
+        Stream a completion from Gemini.
+        
+        Small stream chunks are coalesced into `token` events: a batch is flushed
+        when TOKEN_FLUSH_INTERVAL has passed or when it reaches the current batch
+        size (growing by TOKEN_BATCH_GROWTH_FACTOR up to TOKEN_BATCH_MAX), so the
+        first text reaches the client immediately without one event per SDK chunk.
+        
+        Yields:
+            dict: `token` events, then a single `final_text` event with the full output.
+            A cached response is replayed as one `token` event.
+        """
+        cache_key = self._cache_key(prompt, generation_config)
+        cached = await self._cache_get(cache_key)
+        if cached is not None:
+            yield {"token": cached}
+            yield {"final_text": cached}
+            return
         
-        if "TITLE:" in response_text:
-            parts = response_text.split("SUMMARY:", 1)
-            if len(parts) == 2:
-                title_part = parts[0]
-                summary = parts[1].strip()
-                title_lines = title_part.replace("TITLE:", "").strip().split("\n")
-                if title_lines:
-                    title = title_lines[0].strip()[:100]
+        parts = []
+        # The in-flight slot is held until the stream is fully read
+        async with self._call_semaphore():
+            response = await self._request(self.model, prompt, generation_config, "Summary stream", stream=True)
+            
+            pending = []
+            batch_size = 1
+            last_flush = time.monotonic()
+            async for chunk in response:
+                if not chunk.parts:
+                    continue
+                parts.append(chunk.text)
+                pending.append(chunk.text)
+                now = time.monotonic()
+                if len(pending) >= batch_size or now - last_flush >= TOKEN_FLUSH_INTERVAL:
+                    yield {"token": "".join(pending)}
+                    pending = []
+                    last_flush = now
+                    batch_size = min(batch_size * TOKEN_BATCH_GROWTH_FACTOR, TOKEN_BATCH_MAX)
+            if pending:
+                yield {"token": "".join(pending)}
+        
+        final_text = "".join(parts)
+        self._record_usage(response, tokens_dict, prompt, final_text)
+        await self._cache_set(cache_key, final_text)
+        yield {"final_text": final_text}
+
+    @staticmethod
+    def _cache_key(prompt: Prompt, generation_config: genai.types.GenerationConfig) -> str:
+        """Response cache key: the prompt plus the model and generation settings that shape the output"""
+        parts = [prompt] if isinstance(prompt, str) else prompt
+        return content_hash([get_settings().gemini_model, repr(generation_config), *parts])
+
+    @staticmethod
+    def _retry_delay(error: Exception, attempt: int) -> float:
+        """Seconds to wait before retrying: the server's RetryInfo delay if given, else full-jitter backoff"""
+        match = _RETRY_DELAY_RE.search(str(error))
+        if match:
+            return float(match.group(1) or match.group(2))
+        return random.uniform(0, min((2 ** attempt) * 2, RETRY_MAX_BACKOFF))
+
+    @staticmethod
+    def _record_usage(response, tokens_dict: dict, prompt: Prompt, completion: str) -> None:
+        """
+        Add a call's token usage to tokens_dict.
         
-        return title, summary
+        Uses the exact counts Gemini returns in `usage_metadata`; only when they
+        are missing is usage estimated from character length, so no extra
+        tokenizer pass or count_tokens round trip is needed per call.
+        """
+        usage = getattr(response, "usage_metadata", None)
+        if usage and usage.prompt_token_count:
+            tokens_dict["prompt"] += usage.prompt_token_count
+            tokens_dict["completion"] += usage.candidates_token_count or 0
+        else:
+            tokens_dict["prompt"] += _estimate_tokens(prompt)
+            tokens_dict["completion"] += _estimate_tokens(completion)
+
+    @staticmethod
+    def _build_prompt(
+        kind: str,
+        style: str,
+        language: str,
+        content: str,
+        custom_instructions: Optional[str] = None,
+        **fields
+    ) -> str:
+        """Fill a precompiled prompt template; unknown styles/languages fall back to bullet_points/en"""
+        return Summarizer._prompt_builder(kind, style, language, custom_instructions)(content, **fields)
+
+    @staticmethod
+    def _prompt_builder(
+        kind: str,
+        style: str,
+        language: str,
+        custom_instructions: Optional[str] = None
+    ) -> Callable[..., str]:
+        """
+        Resolve the template and custom instructions line once and return a
+        `build(content, **fields)` function, for prompts built many times with the
+        same options (e.g. every chunk of a document).
+        """
+        if language not in LANGUAGE_INSTRUCTIONS:
+            language = "en"
+        substitute = (PROMPTS.get((kind, style, language)) or PROMPTS[(kind, "bullet_points", language)]).substitute
+        label = _CUSTOM_LABELS[kind]
+        custom = f"{label}: {custom_instructions}" if label and custom_instructions else ""
+
+        def build(content: str, **fields) -> str:
+            return substitute(content=content, custom=custom, **fields)
+        return build
+
+    @classmethod
+    def _build_prompt_parts(
+        cls,
+        kind: str,
+        style: str,
+        language: str,
+        contents: List[str],
+        custom_instructions: Optional[str] = None,
+        **fields
+    ) -> List[str]:
+        """
+        Like `_build_prompt`, but returns the prompt as a list of parts with each
+        item of `contents` as its own part, so the items are never joined into
+        one large string before being sent.
+        """
+        head, _, tail = cls._build_prompt(
+            kind, style, language, _CONTENT_MARK, custom_instructions, **fields
+        ).partition(_CONTENT_MARK)
+        parts = [head]
+        for i, item in enumerate(contents):
+            if i:
+                parts.append(_PART_SEPARATOR)
+            parts.append(item)
+        parts.append(tail)
+        return parts
+
+    def _parse_json_response(self, response_text: str, title_hint: Optional[str] = None) -> Tuple[str, str]:
+        """Decode a structured-output ({"title", "content"}) response; falls back to text parsing"""
+        try:
+            data = orjson.loads(response_text)
+            title = data["title"].strip()[:100] or title_hint or "Document Summary"
+            return title, data["content"].strip()
+        except (orjson.JSONDecodeError, KeyError, TypeError, AttributeError):
+            logger.warning("Structured summary response was not valid JSON; parsing as text")
+            return self._parse_response(response_text, title_hint)
+
+    def _parse_response(self, response_text: str, title_hint: Optional[str] = None) -> Tuple[str, str]:
+        """Parse the model response to extract title and summary (single regex pass)"""
+        # The markers normally sit in the first few hundred characters; only scan
+        # the whole response when they are not there
+        match = (
+            _TITLE_SUMMARY_RE.search(response_text, 0, TITLE_SCAN_LIMIT)
+            or _TITLE_SUMMARY_RE.search(response_text)
+        )
+        if match is None:
+            return title_hint or "Document Summary", response_text
+        title = match["title"].strip(" \t*#")[:100] or title_hint or "Document Summary"
+        return title, response_text[match.end():].strip()
 
     @staticmethod
     def get_available_styles() -> list:
-        """Return list of available summary styles"""
-        return [
-            {"id": "bullet_points", "name": "Bullet Points"},
-            {"id": "paragraph", "name": "Paragraph"},
-            {"id": "detailed", "name": "Detailed Analysis"},
-            {"id": "executive", "name": "Executive Summary"},
-            {"id": "academic", "name": "Academic Style"}
-        ]
+        """Return list of available summary styles (shared module constant; do not mutate)"""
+        return AVAILABLE_STYLES
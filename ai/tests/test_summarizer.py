@@ -0,0 +1,39 @@
+"""
+Summarizer response parsing tests
+Run from the ai/ directory: python -m unittest discover tests
+"""
+
+import unittest
+
+from services import Summarizer
+
+
+class ParseResponseTest(unittest.TestCase):
+    """TITLE:/SUMMARY: parsing of streamed and merged model output"""
+
+    def setUp(self):
+        self.summarizer = Summarizer()
+
+    def test_title_on_marker_line(self):
+        title, summary = self.summarizer._parse_response("TITLE: My Paper\nSUMMARY:\nbody")
+        self.assertEqual(title, "My Paper")
+        self.assertEqual(summary, "body")
+
+    def test_title_on_next_line(self):
+        title, summary = self.summarizer._parse_response("TITLE:\nMy Paper\n\nSUMMARY:\nbody")
+        self.assertEqual(title, "My Paper")
+        self.assertEqual(summary, "body")
+
+    def test_missing_title_uses_hint(self):
+        title, summary = self.summarizer._parse_response("TITLE:\nSUMMARY:\nbody", title_hint="report.pdf")
+        self.assertEqual(title, "report.pdf")
+        self.assertEqual(summary, "body")
+
+    def test_no_markers(self):
+        title, summary = self.summarizer._parse_response("just a summary")
+        self.assertEqual(title, "Document Summary")
+        self.assertEqual(summary, "just a summary")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,13 +1,19 @@
-import json
+import orjson
 import logging
 import traceback
 import pika
+from pika.adapters.asyncio_connection import AsyncioConnection
 import os
 import time
 import asyncio
 from minio import Minio
 from config import get_settings
-from services import PDFExtractor, Summarizer
+from services import PDFExtractor, Summarizer, read_object
+
+try:
+    import uvloop  # installed with uvicorn[standard] (not available on Windows)
+except ImportError:
+    uvloop = None
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - [%(filename)s:%(lineno)d] - %(message)s")
@@ -15,13 +21,14 @@ logger = logging.getLogger("worker")
 
 settings = get_settings()
 
-def main():
+async def consume():
     logger.info("Starting RabbitMQ Worker...")
-    
+    loop = asyncio.get_running_loop()
+
     # Initialize Services
     pdf_extractor = PDFExtractor()
     summarizer = Summarizer()
-    
+
     # Initialize MinIO
     minio_client = Minio(
         settings.minio_endpoint,
@@ -30,51 +37,56 @@ def main():
         secure=settings.minio_use_ssl
     )
 
-    # Connect to RabbitMQ
-    params = pika.URLParameters(settings.rabbitmq_url)
-    connection = pika.BlockingConnection(params)
-    channel = connection.channel()
+    # Resolved with the reason when the RabbitMQ connection or channel fails or closes
+    closed = loop.create_future()
+    # In-flight message tasks (the event loop only keeps weak references to tasks)
+    in_flight = set()
 
-    # Declare Queue & Exchange
-    channel.queue_declare(queue='ai.tasks', durable=True)
-    channel.exchange_declare(exchange='ai.events', exchange_type='topic', durable=True)
+    async def handle_message(ch, method, body):
+        logger.info("Received task: %d bytes", len(body))
 
-    def callback(ch, method, properties, body):
-        logger.info(f"Received task: {len(body)} bytes")
-        
         try:
-            task = json.loads(body)
+            task = orjson.loads(body)
             file_id = task.get("file_id")
-            
+
             # Helper to publish events
             def publish_event(status, data=None):
                 payload = {"file_id": file_id, "status": status}
                 if data:
                     payload.update(data)
-                
+
                 ch.basic_publish(
                     exchange='ai.events',
                     routing_key=f'summary.{file_id}',
-                    body=json.dumps(payload)
+                    body=orjson.dumps(payload)
                 )
 
             publish_event("processing", {"log": "Worker received task"})
 
             async def process_task():
-                # Download File
-                response = minio_client.get_object(settings.minio_bucket_files, task['storage_path'])
-                pdf_bytes = response.read()
-                response.close()
-                response.release_conn()
-                
-                # Validate
-                if not await summarizer.validate_pdf(pdf_bytes):
+                # Download File (blocking HTTP read, kept off the event loop)
+                pdf_bytes = await asyncio.to_thread(
+                    read_object, minio_client, settings.minio_bucket_files, task['storage_path']
+                )
+
+                # Validate, then extract (both off the event loop); only valid files are extracted
+                try:
+                    is_valid = await summarizer.validate_pdf(pdf_bytes)
+                except Exception as e:
+                    # A validator failure is not an invalid file; report what happened
+                    logger.error("PDF validation failed: %s", e)
+                    publish_event("failed", {"error": f"PDF validation failed: {e}"})
+                    return
+                if not is_valid:
                     publish_event("failed", {"error": "Invalid PDF file signature"})
                     return
 
-                # Extract Text
                 publish_event("processing", {"log": "Extracting text..."})
-                text = pdf_extractor.extract_text(pdf_bytes)
+                try:
+                    text = await asyncio.to_thread(pdf_extractor.extract_text, pdf_bytes)
+                except ValueError as e:
+                    publish_event("failed", {"error": str(e)})
+                    return
                 if not text.strip():
                      publish_event("failed", {"error": "No text extracted"})
                      return
@@ -86,7 +98,7 @@ def main():
                     custom_instructions=task.get("custom_instructions"),
                     language=task.get("language", "en")
                 ):
-                    # event contains "log", "result", or "error"
+                    # event contains "log", "token", "result", or "error" ("token" partial output is not relayed)
                     if "result" in event:
                          publish_event("completed", {"result": event["result"]})
                     elif "error" in event:
@@ -94,20 +106,76 @@ def main():
                     elif "log" in event:
                          publish_event("processing", {"log": event["log"]})
 
-            asyncio.run(process_task())
+            await process_task()
 
         except Exception as e:
-            logger.error(f"Error processing task: {e}")
+            logger.error("Error processing task: %s", e)
             logger.error(traceback.format_exc())
             # publish_event("failed", {"error": str(e)}) # Can't publish if outside scope, but we use reliable queue
 
-        ch.basic_ack(delivery_tag=method.delivery_tag)
+        if ch.is_open:
+            ch.basic_ack(delivery_tag=method.delivery_tag)
 
-    channel.basic_qos(prefetch_count=1)
-    channel.basic_consume(queue='ai.tasks', on_message_callback=callback)
-    
-    logger.info("Waiting for messages in [ai.tasks]...")
-    channel.start_consuming()
+    def on_message(ch, method, properties, body):
+        # Each message runs as its own task, so Gemini waits of different tasks overlap
+        message_task = loop.create_task(handle_message(ch, method, body))
+        in_flight.add(message_task)
+        message_task.add_done_callback(in_flight.discard)
+
+    # Channel setup: declare queue & exchange, set prefetch, then consume
+    def on_channel_open(channel):
+        # A channel closed by the broker (e.g. a failed declare) leaves the connection
+        # open but stops consumption, so it ends the worker too
+        channel.add_on_close_callback(on_channel_closed)
+        channel.queue_declare(
+            queue='ai.tasks', durable=True,
+            callback=lambda _frame: on_queue_declared(channel)
+        )
+
+    def on_queue_declared(channel):
+        channel.exchange_declare(
+            exchange='ai.events', exchange_type='topic', durable=True,
+            callback=lambda _frame: on_exchange_declared(channel)
+        )
+
+    def on_exchange_declared(channel):
+        # Up to max_concurrent_summaries messages are in flight at once
+        channel.basic_qos(
+            prefetch_count=settings.max_concurrent_summaries,
+            callback=lambda _frame: on_qos_set(channel)
+        )
+
+    def on_qos_set(channel):
+        channel.basic_consume(queue='ai.tasks', on_message_callback=on_message)
+        logger.info("Waiting for messages in [ai.tasks]...")
+
+    def on_channel_closed(channel, reason):
+        if not closed.done():
+            closed.set_exception(reason if isinstance(reason, BaseException) else ConnectionError(reason))
+
+    def on_connection_closed(connection, reason):
+        if not closed.done():
+            closed.set_exception(reason if isinstance(reason, BaseException) else ConnectionError(reason))
+
+    # Connect to RabbitMQ (callbacks run on this event loop)
+    connection = AsyncioConnection(
+        pika.URLParameters(settings.rabbitmq_url),
+        on_open_callback=lambda conn: conn.channel(on_open_callback=on_channel_open),
+        on_open_error_callback=on_connection_closed,
+        on_close_callback=on_connection_closed,
+        custom_ioloop=loop
+    )
+    try:
+        await closed
+    finally:
+        if connection.is_open:
+            connection.close()
+
+def main():
+    if uvloop is not None:
+        # libuv-based event loop: cheaper task switching for many concurrent awaits
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    asyncio.run(consume())
 
 if __name__ == "__main__":
     main()